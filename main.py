@@ -30,8 +30,23 @@ import random
 import datetime
 from typing import Optional, Literal
 import re
-from collections import defaultdict
+import string
+import copy
+import types
+import pathlib
+import contextlib
+import functools
+import unicodedata
+import bisect
+import heapq
+import hashlib
+import itertools
+import multiprocessing
+from dataclasses import dataclass
+from collections import OrderedDict, deque
 import os
+import sys
+import time
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CONFIGURATION PAR DÉFAUT
@@ -77,11 +92,31 @@ DEFAULT_CONFIG = {
         "auto_mod": {
             "enabled": False,
             "anti_spam": True,
+            "spam_max_messages": 5,
+            "spam_window": 5,
+            "anti_duplicates": False,
+            "duplicate_threshold": 4,
+            "duplicate_window": 60,
             "anti_links": False,
             "anti_caps": False,
             "caps_threshold": 70,
             "max_mentions": 5,
-            "banned_words": []
+            "banned_words": [],
+            "banned_words_mode": "substring",
+            "normalize_text": True,
+            "fuzzy_banned_words": False,
+            "regex_rules": [],
+            "blocked_extensions": [],
+            "max_repeated_chars": 0
+        },
+        "anti_raid": {
+            "enabled": False,
+            "join_threshold": 10,
+            "join_window": 10,
+            "min_account_age_days": 7,
+            "raid_duration": 300,
+            "action": "none",
+            "timeout_minutes": 60
         }
     },
     "tickets": {
@@ -98,22 +133,1357 @@ DEFAULT_CONFIG = {
     }
 }
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# SCHÉMA
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Migrations versionnées (PRAGMA user_version) - ne jamais modifier une version existante,
+# toujours en ajouter une nouvelle à la fin.
+SCHEMA_MIGRATIONS = [
+    # v1 - index des requêtes chaudes
+    [
+        "CREATE INDEX IF NOT EXISTS idx_tickets_user_status ON tickets (user_id, guild_id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_tickets_channel ON tickets (channel_id)",
+        "CREATE INDEX IF NOT EXISTS idx_giveaways_active ON giveaways (ended, end_time)",
+        "CREATE INDEX IF NOT EXISTS idx_giveaways_message ON giveaways (message_id)",
+        "CREATE INDEX IF NOT EXISTS idx_warnings_user ON warnings (user_id, guild_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_users_guild_xp ON users (guild_id, xp)",
+        "CREATE INDEX IF NOT EXISTS idx_users_guild_wealth ON users (guild_id, (balance + bank))",
+        "CREATE INDEX IF NOT EXISTS idx_shop_items_guild ON shop_items (guild_id)"
+    ],
+    # v2 - rappels persistants
+    [
+        """CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            guild_id INTEGER,
+            channel_id INTEGER,
+            content TEXT,
+            due INTEGER,
+            created_at INTEGER
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (due)",
+        "CREATE INDEX IF NOT EXISTS idx_reminders_user ON reminders (user_id, due)"
+    ],
+    # v3 - participation aux giveaways par bouton
+    [
+        "ALTER TABLE giveaways ADD COLUMN mode TEXT DEFAULT 'reaction'",
+        """CREATE TABLE IF NOT EXISTS giveaway_entries (
+            message_id INTEGER,
+            user_id INTEGER,
+            PRIMARY KEY (message_id, user_id)
+        ) WITHOUT ROWID"""
+    ],
+    # v4 - sondages persistants
+    [
+        """CREATE TABLE IF NOT EXISTS polls (
+            message_id INTEGER PRIMARY KEY,
+            guild_id INTEGER,
+            channel_id INTEGER,
+            question TEXT,
+            options TEXT,
+            creator_id INTEGER,
+            created_at INTEGER
+        )""",
+        """CREATE TABLE IF NOT EXISTS poll_votes (
+            message_id INTEGER,
+            user_id INTEGER,
+            option INTEGER,
+            PRIMARY KEY (message_id, user_id)
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_poll_votes_option ON poll_votes (message_id, option)"
+    ],
+]
+
+USER_COLUMNS = (
+    "user_id", "guild_id", "xp", "level", "messages", "balance", "bank",
+    "daily_timestamp", "work_timestamp", "inventory"
+)
+
+# Pragmas appliqués à chaque connexion (WAL: les lecteurs ne bloquent pas l'écrivain)
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000"
+]
+
+# Requêtes du bot vérifiées au démarrage avec EXPLAIN QUERY PLAN: (nom, requête, paramètres)
+HOT_QUERIES = [
+    ("open_ticket", "SELECT id FROM tickets WHERE user_id = ? AND guild_id = ? AND status = 'open' LIMIT 1", (0, 0)),
+    ("get_ticket", "SELECT * FROM tickets WHERE channel_id = ?", (0,)),
+    ("giveaway_deadlines", "SELECT message_id, end_time FROM giveaways WHERE ended = 0 ORDER BY end_time", ()),
+    ("get_giveaway", "SELECT * FROM giveaways WHERE message_id = ?", (0,)),
+    ("giveaway_entries", "SELECT COUNT(*) FROM giveaway_entries WHERE message_id = ?", (0,)),
+    ("poll_tallies", "SELECT option, COUNT(*) FROM poll_votes WHERE message_id = ? GROUP BY option", (0,)),
+    ("due_reminders", "SELECT id, user_id, channel_id, content FROM reminders WHERE due <= ? ORDER BY due LIMIT ?", (0, 500)),
+    ("next_reminder", "SELECT MIN(due) FROM reminders", ()),
+    ("user_reminders", "SELECT id, due, content FROM reminders WHERE user_id = ? ORDER BY due LIMIT ?", (0, 10)),
+    ("end_giveaway", "UPDATE giveaways SET ended = 1 WHERE message_id = ?", (0,)),
+    ("get_warnings", "SELECT * FROM warnings WHERE user_id = ? AND guild_id = ? ORDER BY timestamp DESC", (0, 0)),
+    ("leaderboard_xp", "SELECT user_id, xp as total FROM users WHERE guild_id = ? ORDER BY total DESC LIMIT ?", (0, 10)),
+    ("leaderboard_economy", "SELECT user_id, balance + bank as total FROM users WHERE guild_id = ? ORDER BY total DESC LIMIT ?", (0, 10)),
+    ("rank_xp", "SELECT COUNT(*) + 1 FROM users WHERE guild_id = ? AND xp > ?", (0, 0)),
+    ("rank_economy", "SELECT COUNT(*) + 1 FROM users WHERE guild_id = ? AND balance + bank > ?", (0, 0)),
+    ("get_user", "SELECT xp, level, messages FROM users WHERE user_id = ? AND guild_id = ?", (0, 0)),
+    ("shop_items", "SELECT * FROM shop_items WHERE guild_id = ?", (0,)),
+    ("custom_command", "SELECT * FROM custom_commands WHERE guild_id = ? AND name = ?", (0, "")),
+    ("custom_command_index", "SELECT name, response FROM custom_commands WHERE guild_id = ?", (0,)),
+]
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# AUTO-MODÉRATION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class BannedWordMatcher:
+    """Automate Aho-Corasick: cherche tous les mots interdits en un seul passage.
+
+    En mode mot entier, un '*' en début/fin de mot autorise un préfixe/suffixe
+    (ex: 'arnaque*' bloque 'arnaques' mais pas 'darnaque')."""
+    __slots__ = ("goto", "fail", "output", "whole_words", "literals")
+
+    # En dessous, quelques recherches de sous-chaîne (en C) battent l'automate parcouru en Python
+    LITERAL_MAX_WORDS = 64
+
+    def __init__(self, words, whole_words: bool = False):
+        self.whole_words = whole_words
+        self.goto = [{}]
+        self.output = [()]
+        cores = [w.lower().strip("*") for w in words]
+        cores = [c for c in cores if c]
+        self.literals = tuple(cores) if not whole_words and len(cores) <= self.LITERAL_MAX_WORDS else None
+
+        for word in words:
+            core = word.lower().strip("*")
+            if not core:
+                continue
+            # (mot, longueur, frontière requise avant, frontière requise après)
+            entry = (core, len(core), whole_words and not word.startswith("*"),
+                     whole_words and not word.endswith("*"))
+            node = 0
+            for ch in core:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.output.append(())
+                node = nxt
+            self.output[node] += (entry,)
+
+        # Liens d'échec calculés en largeur; chaque état hérite des sorties de son lien
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for ch, child in self.goto[node].items():
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                target = self.goto[state].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] += self.output[self.fail[child]]
+                queue.append(child)
+
+    def search(self, text: str) -> Optional[str]:
+        """Retourne le premier mot interdit trouvé dans le texte, ou None"""
+        text = text.lower()
+        if self.literals is not None:
+            for word in self.literals:
+                if word in text:
+                    return word
+            return None
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not output[node]:
+                continue
+            for word, length, need_start, need_end in output[node]:
+                start = i - length + 1
+                if need_start and start > 0 and text[start - 1].isalnum():
+                    continue
+                if need_end and i + 1 < len(text) and text[i + 1].isalnum():
+                    continue
+                return word
+        return None
+
+
+# Caractères invisibles insérés pour couper un mot
+INVISIBLE_CHARS = dict.fromkeys(map(ord, "\u00ad\u180e\u200b\u200c\u200d\u2060\ufeff"), None)
+# Homoglyphes cyrilliques/grecs courants (après passage en minuscules)
+CONFUSABLES = str.maketrans({
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o",
+    "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j", "ѕ": "s",
+    "ԁ": "d", "ɡ": "g", "α": "a", "β": "b", "ε": "e", "ι": "i", "κ": "k", "ν": "v",
+    "ο": "o", "ρ": "p", "τ": "t", "υ": "u", "χ": "x"
+})
+LEET_TABLE = str.maketrans("0134578@$!|", "oieastbasil")
+LEET_PUNCT = "@$!|"
+LEET_CHARS = re.compile(r"[0-9@$!|]")
+LEET_RUN = re.compile(r"[\w@$!|]+")
+
+
+def _fold_leet_run(match: re.Match) -> str:
+    run = match.group()
+    # La ponctuation en bord de mot reste une frontière ("merde!", "$merde")
+    core = run.strip(LEET_PUNCT)
+    # Un nombre seul n'est pas du leet ("8173" ne doit pas devenir "bite")
+    if not any(ch.isalpha() for ch in core):
+        return run
+    lead = len(run) - len(run.lstrip(LEET_PUNCT))
+    return run[:lead] + core.translate(LEET_TABLE) + run[lead + len(core):]
+
+
+def fold_leet(text: str) -> str:
+    """Replie le leet uniquement à l'intérieur des mots qui contiennent déjà des lettres"""
+    if LEET_CHARS.search(text) is None:
+        return text
+    return LEET_RUN.sub(_fold_leet_run, text)
+
+
+def normalize_text(content: str) -> str:
+    """Forme canonique pour les mots interdits (le texte et les mots passent par la même fonction)"""
+    if content.isascii():
+        # Cas courant: pas de Unicode à replier
+        return fold_leet(content.lower())
+    return _normalize_unicode(content)
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_unicode(content: str) -> str:
+    # NFKD ramène pleine chasse, exposants et lettres mathématiques à l'ASCII, puis on retire les accents
+    text = unicodedata.normalize("NFKD", content.translate(INVISIBLE_CHARS))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return fold_leet(text.lower().translate(CONFUSABLES))
+
+
+SPAM_MAX_WINDOW = 300  # secondes, borne aussi l'inactivité avant éviction
+
+
+class SpamTracker:
+    """Fenêtre glissante par (serveur, membre) sur des tampons circulaires de taille fixe"""
+
+    def __init__(self, idle_after: float = SPAM_MAX_WINDOW, max_keys: int = 50_000):
+        self.idle_after = idle_after
+        self.max_keys = max_keys
+        # (guild_id, user_id) -> deque des N derniers horodatages, du moins au plus récemment actif
+        self.buckets: OrderedDict = OrderedDict()
+        self.evictions = 0
+
+    def hit(self, guild_id: int, user_id: int, now: float, max_messages: int, window: float) -> bool:
+        """Enregistre un message; True si max_messages tombent dans la fenêtre"""
+        key = (guild_id, user_id)
+        bucket = self.buckets.get(key)
+        if bucket is None or bucket.maxlen != max_messages:
+            bucket = self.buckets[key] = deque(bucket or (), maxlen=max_messages)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+                self.evictions += 1
+        self.buckets.move_to_end(key)
+        bucket.append(now)
+        # Le tampon ne garde que les N derniers messages: il suffit de regarder le plus ancien
+        return len(bucket) == max_messages and now - bucket[0] < window
+
+    def sweep(self, now: float) -> int:
+        """Évince les membres inactifs depuis idle_after secondes"""
+        evicted = 0
+        while self.buckets:
+            key, bucket = next(iter(self.buckets.items()))
+            if now - bucket[-1] <= self.idle_after:
+                break
+            self.buckets.popitem(last=False)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def stats(self) -> dict:
+        timestamps = sum(len(b) for b in self.buckets.values())
+        memory = (
+            sys.getsizeof(self.buckets)
+            + sum(sys.getsizeof(b) for b in self.buckets.values())
+            + timestamps * sys.getsizeof(0.0)
+        )
+        return {
+            "keys": len(self.buckets),
+            "timestamps": timestamps,
+            "memory_bytes": memory,
+            "evictions": self.evictions
+        }
+
+
+DUPLICATE_MAX_WINDOW = 600  # secondes
+NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+
+class DuplicateTracker:
+    """Messages identiques ou quasi identiques postés par plusieurs membres/salons (MinHash + LSH).
+
+    Chaque message donne une signature MinHash à une permutation (un minimum par
+    case de hachage) sur ses 4-grammes de caractères, découpée en bandes. Une bande
+    commune ne fait que proposer un candidat: la similarité estimée sur la signature
+    complète doit atteindre SIMILARITY pour compter comme copie. Le coût par message
+    est borné par MAX_CHARS."""
+
+    SHINGLE = 4
+    MAX_CHARS = 512
+    BANDS = 8
+    ROWS = 4
+    SIMILARITY = 0.6
+    MASK = (1 << 64) - 1
+
+    def __init__(self, min_length: int = 20, max_keys_per_guild: int = 4096):
+        self.min_length = min_length
+        self.max_keys = max_keys_per_guild
+        # guild_id -> OrderedDict(bande -> [vu en dernier, {membre: vu}, {salon: vu}, signature de référence]),
+        # du plus ancien au plus récent
+        self.guilds: dict = {}
+        self.flagged = 0
+
+    def signature(self, content: str) -> Optional[tuple]:
+        """(signature, clés de bandes LSH) du contenu normalisé; None si trop court pour être significatif"""
+        text = NON_WORD_PATTERN.sub(" ", content.lower()).strip()[:self.MAX_CHARS]
+        if len(text) < self.min_length:
+            return None
+        shingles = {hash(text[i:i + self.SHINGLE]) for i in range(len(text) - self.SHINGLE + 1)}
+        slots = self.BANDS * self.ROWS
+        mins = [self.MASK] * slots
+        for h in shingles:
+            h = (h * 0x9E3779B97F4A7C15) & self.MASK
+            slot = h % slots
+            if h < mins[slot]:
+                mins[slot] = h
+        # Une bande restée aux sentinelles (texte court, cases vides) serait commune à des textes sans rapport
+        bands = []
+        for band in range(self.BANDS):
+            rows = mins[band * self.ROWS:(band + 1) * self.ROWS]
+            if any(h != self.MASK for h in rows):
+                bands.append((band, *rows))
+        return mins, bands
+
+    def similarity(self, a: list, b: list) -> float:
+        """Jaccard estimé: part des cases remplies des deux côtés qui ont le même minimum"""
+        filled = same = 0
+        for x, y in zip(a, b):
+            if x != self.MASK and y != self.MASK:
+                filled += 1
+                same += x == y
+        return same / filled if filled else 0.0
+
+    def hit(self, guild_id: int, user_id: int, channel_id: int, content: str,
+            now: float, threshold: int, window: float) -> bool:
+        """Enregistre le message; True si un contenu similaire atteint le seuil dans la fenêtre"""
+        signature = self.signature(content)
+        if signature is None:
+            return False
+        mins, bands = signature
+        buckets = self.guilds.get(guild_id)
+        if buckets is None:
+            buckets = self.guilds[guild_id] = OrderedDict()
+
+        flagged = False
+        for key in bands:
+            entry = buckets.get(key)
+            if entry is None:
+                entry = buckets[key] = [now, {}, {}, mins]
+            elif self.similarity(mins, entry[3]) < self.SIMILARITY:
+                # Collision de bande entre textes différents
+                continue
+            entry[0] = now
+            buckets.move_to_end(key)
+            for seen, member in ((entry[1], user_id), (entry[2], channel_id)):
+                # Fenêtre glissante: chaque membre/salon expire window secondes après sa dernière copie
+                for stale in [k for k, t in seen.items() if now - t > window]:
+                    del seen[stale]
+                # Dictionnaires plafonnés au seuil: mémoire bornée même pendant un raid
+                if member in seen or len(seen) < threshold:
+                    seen[member] = now
+                if len(seen) >= threshold:
+                    flagged = True
+
+        while len(buckets) > self.max_keys:
+            buckets.popitem(last=False)
+        if flagged:
+            self.flagged += 1
+        return flagged
+
+    def sweep(self, now: float):
+        for guild_id in list(self.guilds):
+            buckets = self.guilds[guild_id]
+            while buckets and now - next(iter(buckets.values()))[0] > DUPLICATE_MAX_WINDOW:
+                buckets.popitem(last=False)
+            if not buckets:
+                del self.guilds[guild_id]
+
+    def stats(self) -> dict:
+        return {
+            "guilds": len(self.guilds),
+            "keys": sum(len(b) for b in self.guilds.values()),
+            "flagged": self.flagged
+        }
+
+
+class DeletionQueue:
+    """Suppressions de l'auto-modération regroupées par salon.
+
+    Les messages fautifs d'une courte fenêtre partent en un seul bulk-delete, suivis
+    d'un seul avertissement qui cite chaque membre une fois."""
+
+    def __init__(self, delay: float = 1.0, warn_cooldown: float = 10.0):
+        self.delay = delay
+        self.warn_cooldown = warn_cooldown
+        # channel_id -> (salon, [messages], {membre: [raisons]})
+        self.pending: dict = {}
+        # (channel_id, user_id) -> dernier avertissement (time.monotonic)
+        self.last_warned: dict = {}
+        self._tasks: set = set()
+        self.deleted = 0
+        self.requests = 0
+
+    def queue(self, message: discord.Message, reason: str):
+        channel_id = message.channel.id
+        batch = self.pending.get(channel_id)
+        if batch is None:
+            batch = self.pending[channel_id] = (message.channel, [], {})
+            task = asyncio.create_task(self._flush_later(channel_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        batch[1].append(message)
+        reasons = batch[2].setdefault(message.author, [])
+        if reason not in reasons:
+            reasons.append(reason)
+
+    async def _flush_later(self, channel_id: int):
+        await asyncio.sleep(self.delay)
+        await self.flush(channel_id)
+
+    async def flush(self, channel_id: int):
+        batch = self.pending.pop(channel_id, None)
+        if batch is None:
+            return
+        channel, messages, authors = batch
+
+        try:
+            if len(messages) == 1 or not hasattr(channel, "delete_messages"):
+                for message in messages:
+                    self.requests += 1
+                    with contextlib.suppress(discord.NotFound):
+                        await message.delete()
+            else:
+                # L'API accepte au plus 100 messages par bulk-delete
+                for i in range(0, len(messages), 100):
+                    self.requests += 1
+                    await channel.delete_messages(messages[i:i + 100])
+            self.deleted += len(messages)
+        except discord.HTTPException as e:
+            print(f"Erreur suppression auto-mod: {e}")
+
+        now = time.monotonic()
+        if len(self.last_warned) > 10_000:
+            self.last_warned = {
+                key: t for key, t in self.last_warned.items() if now - t < self.warn_cooldown
+            }
+        lines = []
+        for author, reasons in authors.items():
+            key = (channel_id, author.id)
+            last = self.last_warned.get(key)
+            if last is not None and now - last < self.warn_cooldown:
+                continue
+            self.last_warned[key] = now
+            lines.append(f"⚠️ {author.mention} - {', '.join(reasons)}")
+        if lines:
+            with contextlib.suppress(discord.HTTPException):
+                await channel.send("\n".join(lines)[:2000], delete_after=5)
+
+    async def flush_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for channel_id in list(self.pending):
+            await self.flush(channel_id)
+
+    def stats(self) -> dict:
+        return {
+            "pending": sum(len(batch[1]) for batch in self.pending.values()),
+            "deleted": self.deleted,
+            "requests": self.requests
+        }
+
+
+RAID_MAX_WINDOW = 300  # secondes
+
+
+class RaidDetector:
+    """Taux d'arrivées par serveur sur fenêtre glissante; les comptes récents comptent double"""
+
+    def __init__(self, max_joins: int = 1000):
+        self.max_joins = max_joins
+        # guild_id -> deque[(horodatage, poids)] et somme des poids dans la fenêtre
+        self.joins: dict = {}
+        self.scores: dict = {}
+        # guild_id -> [fin du mode raid, arrivées pendant le raid]
+        self.raids: dict = {}
+
+    def record(self, guild_id: int, now: float, young: bool, threshold: int,
+               window: float, duration: float) -> tuple:
+        """Enregistre une arrivée; retourne (mode raid actif, raid qui vient de commencer)"""
+        joins = self.joins.get(guild_id)
+        if joins is None:
+            joins = self.joins[guild_id] = deque()
+        weight = 2 if young else 1
+        joins.append((now, weight))
+        score = self.scores.get(guild_id, 0) + weight
+        while joins and (now - joins[0][0] > window or len(joins) > self.max_joins):
+            score -= joins.popleft()[1]
+        self.scores[guild_id] = score
+
+        raid = self.raids.get(guild_id)
+        if raid is not None and now < raid[0]:
+            raid[0] = now + duration
+            raid[1] += 1
+            return True, False
+        if score >= threshold:
+            self.raids[guild_id] = [now + duration, len(joins)]
+            return True, True
+        return False, False
+
+    def ended(self, now: float) -> list:
+        """Retire les raids terminés et retourne [(guild_id, arrivées)]; oublie les serveurs calmes"""
+        finished = [(guild_id, raid[1]) for guild_id, raid in self.raids.items() if now >= raid[0]]
+        for guild_id, _ in finished:
+            del self.raids[guild_id]
+        for guild_id in [g for g, joins in self.joins.items() if now - joins[-1][0] > RAID_MAX_WINDOW]:
+            del self.joins[guild_id]
+            del self.scores[guild_id]
+        return finished
+
+    def stats(self) -> dict:
+        return {"guilds": len(self.joins), "raids": len(self.raids)}
+
+
+class RaidActionQueue:
+    """Sanctions du mode raid regroupées par serveur, exécutées avec une concurrence bornée"""
+
+    def __init__(self, delay: float = 2.0, concurrency: int = 4):
+        self.delay = delay
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # guild_id -> (action, minutes de timeout, [membres])
+        self.pending: dict = {}
+        self._tasks: set = set()
+        # Appelé avec (guild, action, réussis, échoués) après chaque lot
+        self.on_batch = None
+
+    def queue(self, member: discord.Member, action: str, timeout_minutes: int):
+        batch = self.pending.get(member.guild.id)
+        if batch is None:
+            batch = self.pending[member.guild.id] = (action, timeout_minutes, [])
+            task = asyncio.create_task(self._flush_later(member.guild.id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        batch[2].append(member)
+
+    async def _flush_later(self, guild_id: int):
+        await asyncio.sleep(self.delay)
+        await self.flush(guild_id)
+
+    async def _apply(self, member: discord.Member, action: str, until: datetime.datetime) -> bool:
+        async with self.semaphore:
+            try:
+                if action == "kick":
+                    await member.kick(reason="Anti-raid")
+                else:
+                    await member.timeout(until, reason="Anti-raid")
+                return True
+            except discord.HTTPException:
+                return False
+
+    async def flush(self, guild_id: int):
+        batch = self.pending.pop(guild_id, None)
+        if batch is None:
+            return
+        action, timeout_minutes, members = batch
+        until = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=timeout_minutes)
+        results = await asyncio.gather(*(self._apply(m, action, until) for m in members))
+        done = sum(results)
+        if self.on_batch:
+            await self.on_batch(members[0].guild, action, done, len(members) - done)
+
+    async def flush_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for guild_id in list(self.pending):
+            await self.flush(guild_id)
+
+
+URL_PATTERN = re.compile(r'https?://\S+')
+
+
+class MessageScan:
+    """Caractéristiques d'un message, calculées à la demande puis gardées pour ses copies identiques"""
+    __slots__ = ("content", "matcher", "normalize", "_caps_ratio", "_longest_run", "_has_url", "_banned_word")
+
+    UNSET = object()
+
+    def __init__(self, content: str, matcher: Optional[BannedWordMatcher] = None, normalize: bool = False):
+        self.content = content
+        self.matcher = matcher
+        self.normalize = normalize
+        self._caps_ratio = self._longest_run = self._has_url = self._banned_word = self.UNSET
+
+    @property
+    def caps_ratio(self) -> float:
+        if self._caps_ratio is self.UNSET:
+            length = len(self.content)
+            self._caps_ratio = (sum(map(str.isupper, self.content)) / length * 100) if length else 0.0
+        return self._caps_ratio
+
+    @property
+    def longest_run(self) -> int:
+        if self._longest_run is self.UNSET:
+            run = longest = 0
+            previous = None
+            for ch in self.content:
+                if ch == previous:
+                    run += 1
+                    if run > longest:
+                        longest = run
+                else:
+                    run = 1
+                    previous = ch
+            self._longest_run = max(longest, 1) if self.content else 0
+        return self._longest_run
+
+    @property
+    def has_url(self) -> bool:
+        if self._has_url is self.UNSET:
+            self._has_url = URL_PATTERN.search(self.content) is not None
+        return self._has_url
+
+    @property
+    def banned_word(self) -> Optional[str]:
+        if self._banned_word is self.UNSET:
+            text = normalize_text(self.content) if self.normalize else self.content
+            self._banned_word = self.matcher.search(text) if self.matcher else None
+        return self._banned_word
+
+
+def evaluate_scan(auto_mod: "AutoModConfig", scan: MessageScan, links_allowed: bool = False) -> Optional[str]:
+    """Règles de contenu activées, des moins chères aux plus chères; chaque mesure n'est calculée
+    que si sa règle est active et que les précédentes sont passées"""
+    if auto_mod.anti_links and not links_allowed and scan.has_url:
+        return "Liens non autorisés"
+    if auto_mod.anti_caps and len(scan.content) > 10 and scan.caps_ratio > auto_mod.caps_threshold:
+        return "Trop de majuscules"
+    if auto_mod.max_repeated_chars and scan.longest_run > auto_mod.max_repeated_chars:
+        return "Caractères répétés"
+    if scan.matcher and scan.banned_word:
+        return "Mot interdit détecté"
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class HeavyRuleSet:
+    """Règles coûteuses (regex, mots approchés); picklable, compilée une fois par worker"""
+    patterns: tuple
+    fuzzy_words: tuple
+    normalize: bool
+
+    @classmethod
+    def build(cls, auto_mod: dict) -> Optional["HeavyRuleSet"]:
+        fuzzy = auto_mod["fuzzy_banned_words"] and auto_mod["banned_words"]
+        if not auto_mod["regex_rules"] and not fuzzy:
+            return None
+        words = [w.strip("*") for w in auto_mod["banned_words"]] if fuzzy else []
+        if auto_mod["normalize_text"]:
+            words = [normalize_text(w) for w in words]
+        return cls(
+            patterns=tuple(auto_mod["regex_rules"]),
+            # Un mot trop court donnerait trop de faux positifs à une faute près
+            fuzzy_words=tuple(sorted({w for w in words if len(w) >= 5})),
+            normalize=auto_mod["normalize_text"]
+        )
+
+    def compile(self) -> tuple:
+        # Une regex par règle: une fusion casserait les drapeaux en ligne, groupes nommés et références
+        regexes = []
+        for pattern in self.patterns:
+            try:
+                regexes.append(re.compile(pattern, re.IGNORECASE))
+            except re.error as e:
+                print(f"Règle regex ignorée ({pattern!r}): {e}")
+        # Voisinage par suppression d'une lettre: distance d'édition <= 1 en O(longueur du mot)
+        variants = {}
+        for word in self.fuzzy_words:
+            variants[word] = word
+            for i in range(len(word)):
+                variants.setdefault(word[:i] + word[i + 1:], word)
+        return tuple(regexes), variants
+
+
+_compiled_heavy_rules: dict = {}
+
+
+def evaluate_heavy_rules(rules: HeavyRuleSet, content: str) -> Optional[str]:
+    """Exécutée dans un worker du pool; la compilation est gardée entre deux messages"""
+    compiled = _compiled_heavy_rules.get(rules)
+    if compiled is None:
+        if len(_compiled_heavy_rules) > 256:
+            _compiled_heavy_rules.clear()
+        compiled = _compiled_heavy_rules[rules] = rules.compile()
+    regexes, variants = compiled
+
+    if any(regex.search(content) for regex in regexes):
+        return "Règle d'auto-modération enfreinte"
+    if variants:
+        text = normalize_text(content) if rules.normalize else content.lower()
+        for token in NON_WORD_PATTERN.split(text):
+            if len(token) < 4:
+                continue
+            if token in variants:
+                return "Mot interdit détecté"
+            for i in range(len(token)):
+                if token[:i] + token[i + 1:] in variants:
+                    return "Mot interdit détecté"
+    return None
+
+
+class HeavyRuleExecutor:
+    """Étage d'auto-modération déporté dans un pool de processus (multiprocessing.Pool).
+
+    Chaque message a un délai maximum; quand le pool est saturé, le message n'est
+    jugé que par les règles légères déjà appliquées en ligne. Une regex emballée ne
+    s'interrompt pas: un délai dépassé ou un pool cassé fait terminer les workers
+    et repartir sur un pool neuf, démarré hors de la boucle asyncio."""
+
+    def __init__(self, workers: int = 2, max_in_flight: int = 32, timeout: float = 2.0):
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.pool = None
+        self._starting: Optional[asyncio.Future] = None
+        self._closed = False
+        self.pending: set = set()  # futures asyncio des vérifications envoyées au pool courant
+        self.in_flight = 0
+        self.dispatched = 0
+        self.timeouts = 0
+        self.saturated = 0
+        self.errors = 0
+        self.recycles = 0
+
+    def _done(self, future):
+        self.in_flight -= 1
+        self.pending.discard(future)
+
+    @staticmethod
+    def _resolve(loop, future, result=None, error=None):
+        # Appelé depuis un thread du pool: on repasse par la boucle asyncio
+        def settle():
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        with contextlib.suppress(RuntimeError):  # boucle déjà fermée
+            loop.call_soon_threadsafe(settle)
+
+    def start(self):
+        """Lance un pool neuf en arrière-plan; les vérifications l'ignorent tant qu'il n'est pas prêt"""
+        if self.pool is None and self._starting is None and not self._closed:
+            self._starting = asyncio.get_running_loop().run_in_executor(None, self._build_pool)
+            self._starting.add_done_callback(self._pool_ready)
+
+    def _build_pool(self):
+        # forkserver: pas de fork d'un processus qui a déjà des threads (aiosqlite, discord)
+        pool = multiprocessing.get_context("forkserver").Pool(self.workers)
+        # Premier aller-retour: le démarrage des workers ne compte pas dans le délai d'un message
+        pool.apply(os.getpid)
+        return pool
+
+    def _pool_ready(self, future: asyncio.Future):
+        self._starting = None
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.errors += 1
+            print(f"Erreur auto-mod (démarrage du pool): {future.exception()}")
+            return
+        if self._closed:
+            future.result().terminate()
+        else:
+            self.pool = future.result()
+
+    def _recycle(self, reason: str):
+        """Termine les workers (et une regex bloquée avec eux) puis abandonne les vérifications en cours"""
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            self.recycles += 1
+            # terminate() attend la fin des processus: hors de la boucle asyncio
+            asyncio.get_running_loop().run_in_executor(None, pool.terminate)
+        for future in list(self.pending):
+            if not future.done():
+                future.set_exception(RuntimeError(f"pool auto-mod recyclé ({reason})"))
+                future.exception()  # lue: pas d'avertissement si plus personne ne l'attend
+        self.start()
+
+    async def check(self, rules: HeavyRuleSet, content: str) -> tuple:
+        """Retourne (raison ou None, verdict définitif); False si délai dépassé, pool saturé ou erreur"""
+        # Pool en (re)démarrage: comme saturé, seules les règles légères s'appliquent
+        if self.in_flight >= self.max_in_flight or self.pool is None:
+            self.start()
+            self.saturated += 1
+            return None, False
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            self.pool.apply_async(
+                evaluate_heavy_rules, (rules, content),
+                callback=lambda result: self._resolve(loop, future, result),
+                error_callback=lambda error: self._resolve(loop, future, error=error)
+            )
+        except ValueError as e:  # pool fermé ou cassé
+            self.errors += 1
+            self._recycle(str(e))
+            return None, False
+        self.in_flight += 1
+        self.dispatched += 1
+        self.pending.add(future)
+        future.add_done_callback(self._done)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout), True
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            # Le worker resterait occupé indéfiniment: on le termine
+            self._recycle("délai dépassé")
+        except Exception as e:
+            self.errors += 1
+            print(f"Erreur auto-mod (pool): {e}")
+        return None, False
+
+    def shutdown(self):
+        self._closed = True
+        if self.pool is not None:
+            # Les workers sont terminés: une regex emballée ne bloque pas la sortie
+            self.pool.terminate()
+            self.pool = None
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "dispatched": self.dispatched,
+            "timeouts": self.timeouts,
+            "saturated": self.saturated,
+            "errors": self.errors,
+            "recycles": self.recycles
+        }
+
+
+class VerdictCache:
+    """LRU des résultats dépendant uniquement du contenu, par version de config auto-mod.
+
+    Les copies d'un même message de spam réutilisent l'analyse et le verdict des règles
+    lourdes; une config modifiée reçoit une nouvelle version, donc ses anciennes entrées
+    ne sont plus jamais lues et sortent de l'LRU."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        # (version, empreinte) -> [MessageScan, verdict des règles lourdes ou MISSING]
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    MISSING = object()
+
+    @staticmethod
+    def key(version: int, content: str) -> tuple:
+        return version, hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+    def get(self, key: tuple) -> Optional[list]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, scan: MessageScan) -> list:
+        entry = self.entries[key] = [scan, self.MISSING]
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total * 100) if total else 0.0
+        }
+
+
+# (message, mot interdit, mot entier, attendu) avec normalisation
+NORMALIZATION_CASES = [
+    ("merde!", "merde", True, True),
+    ("quelle merde!", "merde", True, True),
+    ("$merde", "merde", True, True),
+    ("merde|", "merde", True, True),
+    ("fr33 n1tr0 ici", "free nitro", True, True),
+    ("ＦＲＥＥ ｎｉｔｒｏ", "free nitro", True, True),
+    ("rdv au 8173 rue", "bite", False, False),
+    ("code 1337", "leet", False, False),
+]
+
+
+def check_normalization() -> list:
+    """Retourne les cas de NORMALIZATION_CASES dont le résultat diffère de l'attendu"""
+    failures = []
+    for content, word, whole_words, expected in NORMALIZATION_CASES:
+        matcher = BannedWordMatcher([normalize_text(word)], whole_words)
+        if (matcher.search(normalize_text(content)) is not None) != expected:
+            failures.append((content, word, expected))
+    return failures
+
+
+# Vocabulaire de discussion courant: des messages distincts partagent beaucoup de 4-grammes
+CHAT_WORDS = (
+    "salut bonjour merci pour le la les un une des de du et ou mais donc avec sans dans sur "
+    "qui que quoi est sont fait faire jouer jeu soir demain ce quelqu'un serveur salon vocal "
+    "partie équipe rejoindre ici vite bien trop encore toujours jamais rien tout monde "
+    "vous nous on ils elle il je tu ça va aller venir voir regarder écouter musique film"
+).split()
+
+
+def duplicate_false_positive_rate(messages: int = 3000, seed: int = 7) -> float:
+    """Part (%) de messages distincts signalés comme copies: 5 messages/s, 500 membres, 20 salons"""
+    rng = random.Random(seed)
+    tracker = DuplicateTracker()
+    seen = set()
+    flagged = sent = 0
+    while sent < messages:
+        content = " ".join(rng.choice(CHAT_WORDS) for _ in range(rng.randint(4, 14)))
+        if content in seen:
+            continue
+        seen.add(content)
+        flagged += tracker.hit(1, rng.randrange(500), rng.randrange(20), content, sent / 5, 4, 60)
+        sent += 1
+    return flagged / messages * 100
+
+
+def run_automod_benchmark(iterations: int = 2000):
+    """python main.py --bench-automod : coût par message selon la taille du contenu"""
+    for content, word, expected in check_normalization():
+        print(f"⚠️ Normalisation: {content!r} / {word!r} devrait {'' if expected else 'ne pas '}correspondre")
+    print(f"Faux positifs anti-doublons (messages distincts): {duplicate_false_positive_rate():.2f}%")
+    rng = random.Random(42)
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(4, 10))) for _ in range(2000)]
+
+    def legacy_check(content: str, auto_mod: dict, links_allowed: bool = False) -> Optional[str]:
+        # Chemin d'origine de on_message (hors spam et mentions, inchangés)
+        reason = None
+        if auto_mod["anti_links"] and re.search(r'https?://\S+', content) and not links_allowed:
+            reason = "Liens non autorisés"
+        if auto_mod["anti_caps"] and len(content) > 10:
+            if sum(1 for c in content if c.isupper()) / len(content) * 100 > auto_mod["caps_threshold"]:
+                reason = "Trop de majuscules"
+        for word in auto_mod["banned_words"]:
+            if word.lower() in content.lower():
+                reason = "Mot interdit détecté"
+                break
+        return reason
+
+    # Config par défaut, puis une config typique (liens, majuscules, quelques dizaines de mots)
+    profiles = {"défaut": copy.deepcopy(DEFAULT_CONFIG)}
+    typical = profiles["typique"] = copy.deepcopy(DEFAULT_CONFIG)
+    typical["moderation"]["auto_mod"].update(anti_links=True, anti_caps=True, banned_words=words[:30])
+
+    print(f"{'config':>8} | {'taille':>6} | {'ancien (µs)':>12} | {'scanner (µs)':>12}")
+    for name, config in profiles.items():
+        raw = config["moderation"]["auto_mod"]
+        auto_mod = GuildConfig.from_dict(config).moderation.auto_mod
+        for size in (50, 200, 2000):
+            content = "".join(rng.choice(alphabet + "   ABC") for _ in range(size))
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                legacy_check(content, raw)
+            legacy = (time.perf_counter() - start) / iterations * 1e6
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                evaluate_scan(auto_mod, MessageScan(content, auto_mod.banned_matcher, auto_mod.normalize_text))
+            scanner = (time.perf_counter() - start) / iterations * 1e6
+
+            print(f"{name:>8} | {size:>6} | {legacy:>12.1f} | {scanner:>12.1f}")
+
+    # Débit avec et sans normalisation, sur un mélange ASCII / Unicode avec des répétitions
+    samples = [
+        "salut tout le monde, qui joue ce soir ?",
+        "fr33 n1tr0 ici, cl1que vite !!",
+        "ＦＲＥＥ ｎｉｔｒｏ pour tous",
+        "bonjour\u200b à\u200c tous, ça va ?",
+        "frее nitrо (cyrillique)",
+        "Était-ce déjà l'heure du café ?"
+    ]
+    corpus = [rng.choice(samples) + " " + rng.choice(words) for _ in range(500)]
+    matchers = {False: BannedWordMatcher(words), True: BannedWordMatcher([normalize_text(w) for w in words])}
+    print()
+    print(f"{'normalisation':>13} | {'messages/s':>12}")
+    for normalize in (False, True):
+        _normalize_unicode.cache_clear()
+        start = time.perf_counter()
+        for _ in range(iterations // 100):
+            for content in corpus:
+                MessageScan(content, matchers[normalize], normalize).banned_word
+        rate = iterations // 100 * len(corpus) / (time.perf_counter() - start)
+        print(f"{'oui' if normalize else 'non':>13} | {rate:>12,.0f}")
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONFIGURATION COMPILÉE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Chaque compilation de config auto-mod reçoit une version unique (clé du cache de verdicts)
+AUTOMOD_VERSIONS = itertools.count(1)
+
+
+@dataclass(frozen=True, slots=True)
+class WelcomeConfig:
+    enabled: bool
+    channel_id: Optional[int]
+    message: str
+    dm_enabled: bool
+    dm_message: str
+    auto_role: Optional[int]
+
+
+@dataclass(frozen=True, slots=True)
+class GoodbyeConfig:
+    enabled: bool
+    channel_id: Optional[int]
+    message: str
+
+
+@dataclass(frozen=True, slots=True)
+class LevelingConfig:
+    enabled: bool
+    xp_min: int
+    xp_max: int
+    xp_cooldown: int
+    level_up_channel: Optional[int]
+    level_up_message: str
+    role_rewards: types.MappingProxyType  # niveau (int) -> role_id
+
+
+@dataclass(frozen=True, slots=True)
+class EconomyConfig:
+    enabled: bool
+    currency_name: str
+    currency_symbol: str
+    daily_amount: int
+    work_min: int
+    work_max: int
+    work_cooldown: int
+
+
+@dataclass(frozen=True, slots=True)
+class AutoModConfig:
+    version: int
+    enabled: bool
+    anti_spam: bool
+    spam_max_messages: int
+    spam_window: int  # secondes
+    anti_duplicates: bool
+    duplicate_threshold: int  # membres ou salons distincts
+    duplicate_window: int  # secondes
+    anti_links: bool
+    anti_caps: bool
+    caps_threshold: int
+    max_mentions: int
+    banned_words: frozenset  # déjà en minuscules
+    banned_words_mode: str
+    normalize_text: bool  # homoglyphes, leetspeak et caractères invisibles repliés avant la recherche
+    banned_matcher: Optional[BannedWordMatcher]  # None si aucun mot interdit
+    blocked_extensions: tuple  # en minuscules, avec le point
+    heavy_rules: Optional["HeavyRuleSet"]  # évaluées hors du processus principal
+    max_repeated_chars: int  # 0 = désactivé
+
+
+@dataclass(frozen=True, slots=True)
+class AntiRaidConfig:
+    enabled: bool
+    join_threshold: int  # score d'arrivées (compte récent = 2)
+    join_window: int  # secondes
+    min_account_age_days: int
+    raid_duration: int  # secondes sans burst avant la fin du mode raid
+    action: str  # "none", "timeout" ou "kick"
+    timeout_minutes: int
+
+
+@dataclass(frozen=True, slots=True)
+class ModerationConfig:
+    log_channel: Optional[int]
+    mute_role: Optional[int]
+    auto_mod: AutoModConfig
+    anti_raid: AntiRaidConfig
+
+
+@dataclass(frozen=True, slots=True)
+class TicketsConfig:
+    enabled: bool
+    category_id: Optional[int]
+    archive_category_id: Optional[int]
+    log_channel: Optional[int]
+    support_role: Optional[int]
+    categories: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class GuildConfig:
+    """Configuration d'un serveur, compilée une seule fois depuis le JSON sauvegardé"""
+    prefix: str
+    language: str
+    welcome: WelcomeConfig
+    goodbye: GoodbyeConfig
+    leveling: LevelingConfig
+    economy: EconomyConfig
+    moderation: ModerationConfig
+    tickets: TicketsConfig
+    raw: dict  # dict fusionné d'origine, ne jamais le modifier directement
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "GuildConfig":
+        welcome = config["welcome"]
+        goodbye = config["goodbye"]
+        leveling = config["leveling"]
+        economy = config["economy"]
+        moderation = config["moderation"]
+        auto_mod = moderation["auto_mod"]
+        anti_raid = moderation["anti_raid"]
+        tickets = config["tickets"]
+
+        return cls(
+            prefix=config["prefix"],
+            language=config["language"],
+            welcome=WelcomeConfig(
+                enabled=welcome["enabled"],
+                channel_id=welcome["channel_id"],
+                message=welcome["message"],
+                dm_enabled=welcome["dm_enabled"],
+                dm_message=welcome["dm_message"],
+                auto_role=welcome["auto_role"]
+            ),
+            goodbye=GoodbyeConfig(
+                enabled=goodbye["enabled"],
+                channel_id=goodbye["channel_id"],
+                message=goodbye["message"]
+            ),
+            leveling=LevelingConfig(
+                enabled=leveling["enabled"],
+                xp_min=leveling["xp_min"],
+                xp_max=leveling["xp_max"],
+                xp_cooldown=leveling["xp_cooldown"],
+                level_up_channel=leveling["level_up_channel"],
+                level_up_message=leveling["level_up_message"],
+                role_rewards=types.MappingProxyType(
+                    {int(level): role_id for level, role_id in leveling["role_rewards"].items()}
+                )
+            ),
+            economy=EconomyConfig(
+                enabled=economy["enabled"],
+                currency_name=economy["currency_name"],
+                currency_symbol=economy["currency_symbol"],
+                daily_amount=economy["daily_amount"],
+                work_min=economy["work_min"],
+                work_max=economy["work_max"],
+                work_cooldown=economy["work_cooldown"]
+            ),
+            moderation=ModerationConfig(
+                log_channel=moderation["log_channel"],
+                mute_role=moderation["mute_role"],
+                auto_mod=AutoModConfig(
+                    version=next(AUTOMOD_VERSIONS),
+                    enabled=auto_mod["enabled"],
+                    anti_spam=auto_mod["anti_spam"],
+                    spam_max_messages=auto_mod["spam_max_messages"],
+                    spam_window=auto_mod["spam_window"],
+                    anti_duplicates=auto_mod["anti_duplicates"],
+                    duplicate_threshold=auto_mod["duplicate_threshold"],
+                    duplicate_window=auto_mod["duplicate_window"],
+                    anti_links=auto_mod["anti_links"],
+                    anti_caps=auto_mod["anti_caps"],
+                    caps_threshold=auto_mod["caps_threshold"],
+                    max_mentions=auto_mod["max_mentions"],
+                    banned_words=frozenset(w.lower() for w in auto_mod["banned_words"]),
+                    banned_words_mode=auto_mod["banned_words_mode"],
+                    normalize_text=auto_mod["normalize_text"],
+                    banned_matcher=BannedWordMatcher(
+                        [normalize_text(w) for w in auto_mod["banned_words"]]
+                        if auto_mod["normalize_text"] else auto_mod["banned_words"],
+                        auto_mod["banned_words_mode"] == "word"
+                    ) if auto_mod["banned_words"] else None,
+                    blocked_extensions=tuple(
+                        "." + ext.lower().lstrip(".") for ext in auto_mod["blocked_extensions"]
+                    ),
+                    heavy_rules=HeavyRuleSet.build(auto_mod),
+                    max_repeated_chars=auto_mod["max_repeated_chars"]
+                ),
+                anti_raid=AntiRaidConfig(
+                    enabled=anti_raid["enabled"],
+                    join_threshold=anti_raid["join_threshold"],
+                    join_window=anti_raid["join_window"],
+                    min_account_age_days=anti_raid["min_account_age_days"],
+                    raid_duration=anti_raid["raid_duration"],
+                    action=anti_raid["action"],
+                    timeout_minutes=anti_raid["timeout_minutes"]
+                )
+            ),
+            tickets=TicketsConfig(
+                enabled=tickets["enabled"],
+                category_id=tickets["category_id"],
+                archive_category_id=tickets.get("archive_category_id"),
+                log_channel=tickets["log_channel"],
+                support_role=tickets["support_role"],
+                categories=tuple(dict(cat) for cat in tickets["categories"])
+            ),
+            raw=config
+        )
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # BASE DE DONNÉES
 # ═══════════════════════════════════════════════════════════════════════════════
 
 class Database:
-    def __init__(self, db_path: str = "ultrabot.db"):
+    def __init__(self, db_path: str = "ultrabot.db", config_cache_size: int = 1000,
+                 group_commit: bool = False, max_commit_latency: float = 0.01,
+                 max_pending_writes: int = 1000, read_pool_size: int = 3):
         self.db_path = db_path
-        self.conn: Optional[aiosqlite.Connection] = None
+        self.conn: Optional[aiosqlite.Connection] = None  # connexion d'écriture
+
+        # Pool de connexions en lecture seule pour les requêtes lourdes
+        self.read_pool_size = read_pool_size
+        self.read_pool: Optional[asyncio.Queue] = None
+        self._readers: list = []
+
+        # Group-commit: les écritures concurrentes partagent un seul COMMIT (un seul fsync)
+        self.group_commit = group_commit
+        self.max_commit_latency = max_commit_latency
+        self.max_pending_writes = max_pending_writes
+        self.pending_writes = 0
+        self.write_count = 0
+        self.commit_count = 0
+        self._commit_task: Optional[asyncio.Task] = None
+        self._commit_lock = asyncio.Lock()
+
+        # Classements XP / économie gardés en mémoire
+        self.leaderboards = LeaderboardCache()
+
+        # Cache LRU des configurations de serveur (write-through)
+        self.config_cache: OrderedDict = OrderedDict()
+        self.config_cache_size = config_cache_size
+        self.config_cache_hits = 0
+        self.config_cache_misses = 0
 
     async def connect(self):
         self.conn = await aiosqlite.connect(self.db_path)
+        await self.conn.execute("PRAGMA journal_mode = WAL")
+        for pragma in CONNECTION_PRAGMAS:
+            await self.conn.execute(pragma)
         await self.create_tables()
 
+        # Une base en mémoire n'est pas partageable: tout passe par l'écrivain
+        if self.db_path != ":memory:" and self.read_pool_size > 0:
+            uri = pathlib.Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            self.read_pool = asyncio.Queue()
+            for _ in range(self.read_pool_size):
+                reader = await aiosqlite.connect(uri, uri=True)
+                for pragma in CONNECTION_PRAGMAS:
+                    await reader.execute(pragma)
+                self._readers.append(reader)
+                self.read_pool.put_nowait(reader)
+
+    @contextlib.asynccontextmanager
+    async def reader(self):
+        """Emprunte une connexion en lecture seule (ou l'écrivain s'il n'y a pas de pool)"""
+        if self.read_pool is None:
+            yield self.conn
+            return
+        # Les lecteurs ne voient que les données validées
+        if self.pending_writes:
+            await self.flush()
+        conn = await self.read_pool.get()
+        try:
+            yield conn
+        finally:
+            self.read_pool.put_nowait(conn)
+
     async def close(self):
         if self.conn:
+            if self._commit_task:
+                self._commit_task.cancel()
+                self._commit_task = None
+            await self.flush()
+            await self.conn.execute("PRAGMA optimize")
             await self.conn.close()
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
+        self.read_pool = None
+
+    @contextlib.asynccontextmanager
+    async def write_cursor(self, sql: str, params=()):
+        """Écriture à curseur (RETURNING): un COMMIT ne peut pas tomber tant que le curseur est ouvert"""
+        async with self._commit_lock:
+            async with self.conn.execute(sql, params) as cursor:
+                yield cursor
+
+    async def commit(self):
+        """Valide une écriture. En mode group-commit, le COMMIT est différé d'au plus
+        max_commit_latency secondes et partagé avec les autres écritures en attente."""
+        self.write_count += 1
+        if not self.group_commit:
+            async with self._commit_lock:
+                await self.conn.commit()
+            self.commit_count += 1
+            return
+
+        self.pending_writes += 1
+        if self.pending_writes >= self.max_pending_writes:
+            await self.flush()
+        elif self._commit_task is None:
+            self._commit_task = asyncio.create_task(self._delayed_commit())
+
+    async def _delayed_commit(self):
+        await asyncio.sleep(self.max_commit_latency)
+        self._commit_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Erreur group-commit: {e}")
+
+    async def flush(self):
+        """Valide immédiatement les écritures en attente; durables au retour"""
+        async with self._commit_lock:
+            if not self.pending_writes:
+                return
+            # Remis à zéro seulement après un COMMIT réussi: un échec laisse les écritures à valider
+            await self.conn.commit()
+            self.pending_writes = 0
+            self.commit_count += 1
+
+    def write_stats(self) -> dict:
+        return {
+            "group_commit": self.group_commit,
+            "writes": self.write_count,
+            "commits": self.commit_count,
+            "pending": self.pending_writes
+        }
 
     async def create_tables(self):
         queries = [
@@ -183,20 +1553,55 @@ class Database:
         ]
         for query in queries:
             await self.conn.execute(query)
+
+        # Migrations pas encore appliquées à cette base
+        async with self.conn.execute("PRAGMA user_version") as cursor:
+            version = (await cursor.fetchone())[0]
+        for target, migration in enumerate(SCHEMA_MIGRATIONS[version:], version + 1):
+            for query in migration:
+                await self.conn.execute(query)
+            await self.conn.execute(f"PRAGMA user_version = {target}")
         await self.conn.commit()
 
+    async def check_query_plans(self) -> list:
+        """Retourne les requêtes chaudes qui font encore un parcours complet de table"""
+        problems = []
+        for name, query, params in HOT_QUERIES:
+            async with self.conn.execute(f"EXPLAIN QUERY PLAN {query}", params) as cursor:
+                details = [row[3] for row in await cursor.fetchall()]
+            for detail in details:
+                # "SCAN table" sans index = parcours complet; "USE TEMP B-TREE" = tri en mémoire
+                if (detail.startswith("SCAN") and "USING" not in detail) or "TEMP B-TREE" in detail:
+                    problems.append((name, detail))
+        return problems
+
     # Guild Config
-    async def get_guild_config(self, guild_id: int) -> dict:
+    async def get_config(self, guild_id: int) -> GuildConfig:
+        """Configuration compilée (lecture seule) - à utiliser sur les chemins chauds"""
+        config = self.config_cache.get(guild_id)
+        if config is not None:
+            self.config_cache.move_to_end(guild_id)
+            self.config_cache_hits += 1
+            return config
+
+        self.config_cache_misses += 1
         async with self.conn.execute(
             "SELECT config FROM guilds WHERE guild_id = ?", (guild_id,)
         ) as cursor:
             row = await cursor.fetchone()
-            if row:
-                config = DEFAULT_CONFIG.copy()
-                saved = json.loads(row[0])
-                self._deep_update(config, saved)
-                return config
-            return DEFAULT_CONFIG.copy()
+
+        # deepcopy: une copie superficielle partagerait les sous-dicts de DEFAULT_CONFIG
+        raw = copy.deepcopy(DEFAULT_CONFIG)
+        if row:
+            self._deep_update(raw, json.loads(row[0]))
+        config = GuildConfig.from_dict(raw)
+        self._cache_config(guild_id, config)
+        return config
+
+    async def get_guild_config(self, guild_id: int) -> dict:
+        """Copie modifiable de la configuration, à repasser à set_guild_config"""
+        config = await self.get_config(guild_id)
+        return copy.deepcopy(config.raw)
 
     async def set_guild_config(self, guild_id: int, config: dict):
         await self.conn.execute(
@@ -204,7 +1609,30 @@ class Database:
             ON CONFLICT(guild_id) DO UPDATE SET config = ?""",
             (guild_id, json.dumps(config), json.dumps(config))
         )
-        await self.conn.commit()
+        await self.commit()
+        self._cache_config(guild_id, GuildConfig.from_dict(copy.deepcopy(config)))
+
+    def _cache_config(self, guild_id: int, config: GuildConfig):
+        self.config_cache[guild_id] = config
+        self.config_cache.move_to_end(guild_id)
+        # Éviction des serveurs inactifs les plus anciens
+        while len(self.config_cache) > self.config_cache_size:
+            self.config_cache.popitem(last=False)
+
+    def invalidate_guild_config(self, guild_id: int):
+        self.config_cache.pop(guild_id, None)
+
+    def cache_stats(self) -> dict:
+        total = self.config_cache_hits + self.config_cache_misses
+        return {
+            "config_entries": len(self.config_cache),
+            "config_hits": self.config_cache_hits,
+            "config_misses": self.config_cache_misses,
+            "config_hit_rate": (self.config_cache_hits / total * 100) if total else 0.0,
+            "leaderboards": len(self.leaderboards.boards),
+            "leaderboard_hits": self.leaderboards.hits,
+            "leaderboard_warms": self.leaderboards.warms
+        }
 
     def _deep_update(self, base: dict, update: dict):
         for key, value in update.items():
@@ -215,33 +1643,171 @@ class Database:
 
     # User Data
     async def get_user(self, user_id: int, guild_id: int) -> dict:
+        return await self.get_user_fields(user_id, guild_id, *USER_COLUMNS)
+
+    async def get_user_fields(self, user_id: int, guild_id: int, *columns: str) -> dict:
+        """Ne lit que les colonnes demandées; crée la ligne du membre si besoin"""
+        for column in columns:
+            if column not in USER_COLUMNS:
+                raise ValueError(f"Colonne inconnue: {column}")
+        selected = ", ".join(columns)
+
         async with self.conn.execute(
-            "SELECT * FROM users WHERE user_id = ? AND guild_id = ?",
+            f"SELECT {selected} FROM users WHERE user_id = ? AND guild_id = ?",
             (user_id, guild_id)
         ) as cursor:
             row = await cursor.fetchone()
-            if row:
-                return {
-                    "user_id": row[0], "guild_id": row[1], "xp": row[2],
-                    "level": row[3], "messages": row[4], "balance": row[5],
-                    "bank": row[6], "daily_timestamp": row[7], "work_timestamp": row[8],
-                    "inventory": json.loads(row[9])
-                }
-            await self.conn.execute(
-                "INSERT INTO users (user_id, guild_id) VALUES (?, ?)",
+
+        if row is None:
+            # Nouveau membre: un seul upsert qui renvoie la ligne (sûr même en cas de course)
+            async with self.write_cursor(
+                f"""INSERT INTO users (user_id, guild_id) VALUES (?, ?)
+                ON CONFLICT(user_id, guild_id) DO UPDATE SET user_id = excluded.user_id
+                RETURNING {selected}""",
                 (user_id, guild_id)
-            )
-            await self.conn.commit()
-            return await self.get_user(user_id, guild_id)
+            ) as cursor:
+                row = await cursor.fetchone()
+            await self.commit()
+            self.leaderboards.update(guild_id, user_id, "xp", 0)
+            self.leaderboards.update(guild_id, user_id, "economy", 0)
+
+        user = dict(zip(columns, row))
+        if "inventory" in user:
+            user["inventory"] = json.loads(user["inventory"])
+        return user
 
     async def update_user(self, user_id: int, guild_id: int, **kwargs):
         sets = ", ".join(f"{k} = ?" for k in kwargs.keys())
         values = list(kwargs.values()) + [user_id, guild_id]
-        await self.conn.execute(
-            f"UPDATE users SET {sets} WHERE user_id = ? AND guild_id = ?",
+        async with self.write_cursor(
+            f"UPDATE users SET {sets} WHERE user_id = ? AND guild_id = ? RETURNING xp, balance + bank",
             values
+        ) as cursor:
+            row = await cursor.fetchone()
+        await self.commit()
+
+        if row:
+            if "xp" in kwargs:
+                self.leaderboards.update(guild_id, user_id, "xp", row[0])
+            if "balance" in kwargs or "bank" in kwargs:
+                self.leaderboards.update(guild_id, user_id, "economy", row[1])
+
+    async def apply_xp_batch(self, rows: list):
+        """rows: (xp_delta, messages_delta, level, user_id, guild_id) - une seule transaction"""
+        await self.conn.executemany(
+            """UPDATE users SET xp = xp + ?, messages = messages + ?, level = ?
+            WHERE user_id = ? AND guild_id = ?""",
+            rows
         )
-        await self.conn.commit()
+        await self.commit()
+
+    # Economy - chaque opération est une seule requête atomique côté SQL
+    def _notify_wealth(self, guild_id: int, rows: list):
+        for user_id, wealth in rows:
+            self.leaderboards.update(guild_id, user_id, "economy", wealth)
+
+    async def add_money(self, user_id: int, guild_id: int, amount: int, field: str = "balance") -> int:
+        """Crédite (ou débite si négatif) sans lecture préalable; retourne le nouveau montant"""
+        if field not in ("balance", "bank"):
+            raise ValueError(f"Champ inconnu: {field}")
+        async with self.write_cursor(
+            f"""INSERT INTO users (user_id, guild_id, {field}) VALUES (?, ?, ?)
+            ON CONFLICT(user_id, guild_id) DO UPDATE SET {field} = {field} + excluded.{field}
+            RETURNING {field}, balance + bank""",
+            (user_id, guild_id, amount)
+        ) as cursor:
+            row = await cursor.fetchone()
+        await self.commit()
+        self._notify_wealth(guild_id, [(user_id, row[1])])
+        return row[0]
+
+    async def remove_money(self, user_id: int, guild_id: int, amount: int) -> int:
+        """Retire du portefeuille sans descendre sous 0; retourne le nouveau solde"""
+        async with self.write_cursor(
+            """UPDATE users SET balance = MAX(0, balance - ?)
+            WHERE user_id = ? AND guild_id = ? RETURNING balance, balance + bank""",
+            (amount, user_id, guild_id)
+        ) as cursor:
+            row = await cursor.fetchone()
+        await self.commit()
+        if row is None:
+            return 0
+        self._notify_wealth(guild_id, [(user_id, row[1])])
+        return row[0]
+
+    async def try_debit(self, user_id: int, guild_id: int, amount: int) -> Optional[int]:
+        """Débit conditionnel: None si le solde est insuffisant, sinon le nouveau solde"""
+        async with self.write_cursor(
+            """UPDATE users SET balance = balance - ?
+            WHERE user_id = ? AND guild_id = ? AND balance >= ?
+            RETURNING balance, balance + bank""",
+            (amount, user_id, guild_id, amount)
+        ) as cursor:
+            row = await cursor.fetchone()
+        # Même sans ligne modifiée: l'instruction a ouvert la transaction implicite
+        await self.commit()
+        if row is None:
+            return None
+        self._notify_wealth(guild_id, [(user_id, row[1])])
+        return row[0]
+
+    async def move_money(self, user_id: int, guild_id: int, amount: int, to_bank: bool = True) -> Optional[tuple]:
+        """Portefeuille <-> banque; None si fonds insuffisants, sinon (balance, bank)"""
+        source, target = ("balance", "bank") if to_bank else ("bank", "balance")
+        async with self.write_cursor(
+            f"""UPDATE users SET {source} = {source} - ?, {target} = {target} + ?
+            WHERE user_id = ? AND guild_id = ? AND {source} >= ?
+            RETURNING balance, bank""",
+            (amount, amount, user_id, guild_id, amount)
+        ) as cursor:
+            row = await cursor.fetchone()
+        # Même sans ligne modifiée: l'instruction a ouvert la transaction implicite
+        await self.commit()
+        if row is None:
+            return None
+        return row[0], row[1]
+
+    async def claim_reward(self, user_id: int, guild_id: int, amount: int,
+                           timestamp_field: str, now: int, cooldown: int) -> Optional[int]:
+        """Crédite seulement si le cooldown est écoulé (daily/work); None sinon"""
+        if timestamp_field not in ("daily_timestamp", "work_timestamp"):
+            raise ValueError(f"Champ inconnu: {timestamp_field}")
+        async with self.write_cursor(
+            f"""INSERT INTO users (user_id, guild_id, balance, {timestamp_field}) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, guild_id) DO UPDATE
+            SET balance = balance + excluded.balance, {timestamp_field} = excluded.{timestamp_field}
+            WHERE {timestamp_field} <= ?
+            RETURNING balance, balance + bank""",
+            (user_id, guild_id, amount, now, now - cooldown)
+        ) as cursor:
+            row = await cursor.fetchone()
+        # Même sans ligne modifiée: l'instruction a ouvert la transaction implicite
+        await self.commit()
+        if row is None:
+            return None
+        self._notify_wealth(guild_id, [(user_id, row[1])])
+        return row[0]
+
+    async def transfer(self, guild_id: int, from_id: int, to_id: int, amount: int) -> bool:
+        """Transfert atomique: débit et crédit dans une seule instruction UPDATE"""
+        if from_id == to_id or amount <= 0:
+            raise ValueError("Transfert invalide")
+        await self.conn.execute(
+            "INSERT INTO users (user_id, guild_id) VALUES (?, ?) ON CONFLICT(user_id, guild_id) DO NOTHING",
+            (to_id, guild_id)
+        )
+        async with self.write_cursor(
+            """UPDATE users SET balance = balance + CASE WHEN user_id = ? THEN ? ELSE -? END
+            WHERE guild_id = ? AND user_id IN (?, ?)
+            AND (SELECT balance FROM users WHERE user_id = ? AND guild_id = ?) >= ?
+            RETURNING user_id, balance + bank""",
+            (to_id, amount, amount, guild_id, from_id, to_id, from_id, guild_id, amount)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        # Toujours validé: l'INSERT du destinataire a ouvert la transaction, même si le débit échoue
+        await self.commit()
+        self._notify_wealth(guild_id, rows)
+        return len(rows) == 2
 
     # Warnings
     async def add_warning(self, user_id: int, guild_id: int, mod_id: int, reason: str):
@@ -250,10 +1816,10 @@ class Database:
             VALUES (?, ?, ?, ?, ?)""",
             (user_id, guild_id, mod_id, reason, int(datetime.datetime.now().timestamp()))
         )
-        await self.conn.commit()
+        await self.commit()
 
     async def get_warnings(self, user_id: int, guild_id: int) -> list:
-        async with self.conn.execute(
+        async with self.reader() as conn, conn.execute(
             "SELECT * FROM warnings WHERE user_id = ? AND guild_id = ? ORDER BY timestamp DESC",
             (user_id, guild_id)
         ) as cursor:
@@ -264,7 +1830,7 @@ class Database:
             "DELETE FROM warnings WHERE user_id = ? AND guild_id = ?",
             (user_id, guild_id)
         )
-        await self.conn.commit()
+        await self.commit()
 
     # Tickets
     async def create_ticket(self, channel_id: int, guild_id: int, user_id: int, category: str) -> int:
@@ -273,7 +1839,7 @@ class Database:
             VALUES (?, ?, ?, ?, ?)""",
             (channel_id, guild_id, user_id, category, int(datetime.datetime.now().timestamp()))
         )
-        await self.conn.commit()
+        await self.commit()
         return cursor.lastrowid
 
     async def close_ticket(self, channel_id: int):
@@ -281,7 +1847,14 @@ class Database:
             "UPDATE tickets SET status = 'closed', closed_at = ? WHERE channel_id = ?",
             (int(datetime.datetime.now().timestamp()), channel_id)
         )
-        await self.conn.commit()
+        await self.commit()
+
+    async def get_open_ticket(self, user_id: int, guild_id: int):
+        async with self.conn.execute(
+            "SELECT id FROM tickets WHERE user_id = ? AND guild_id = ? AND status = 'open' LIMIT 1",
+            (user_id, guild_id)
+        ) as cursor:
+            return await cursor.fetchone()
 
     async def get_ticket(self, channel_id: int):
         async with self.conn.execute(
@@ -291,25 +1864,154 @@ class Database:
 
     # Giveaways
     async def create_giveaway(self, message_id: int, channel_id: int, guild_id: int,
-                              prize: str, winners: int, end_time: int, host_id: int):
+                              prize: str, winners: int, end_time: int, host_id: int,
+                              mode: str = "reaction"):
         await self.conn.execute(
-            """INSERT INTO giveaways (message_id, channel_id, guild_id, prize, winners, end_time, host_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (message_id, channel_id, guild_id, prize, winners, end_time, host_id)
+            """INSERT INTO giveaways (message_id, channel_id, guild_id, prize, winners, end_time, host_id, mode)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (message_id, channel_id, guild_id, prize, winners, end_time, host_id, mode)
         )
-        await self.conn.commit()
+        await self.commit()
+
+    async def add_giveaway_entry(self, message_id: int, user_id: int) -> Optional[bool]:
+        """True si nouvelle participation, False si déjà inscrit, None si le giveaway est terminé"""
+        async with self.conn.execute(
+            "SELECT ended FROM giveaways WHERE message_id = ?", (message_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None or row[0]:
+            return None
+        async with self.write_cursor(
+            "INSERT OR IGNORE INTO giveaway_entries (message_id, user_id) VALUES (?, ?)",
+            (message_id, user_id)
+        ) as cursor:
+            entered = cursor.rowcount == 1
+        await self.commit()
+        return entered
 
-    async def get_active_giveaways(self):
+    async def count_giveaway_entries(self, message_id: int) -> int:
         async with self.conn.execute(
-            "SELECT * FROM giveaways WHERE ended = 0"
+            "SELECT COUNT(*) FROM giveaway_entries WHERE message_id = ?", (message_id,)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+    async def draw_giveaway_entries(self, message_id: int, count: int) -> list:
+        """Tirage sans remise dans SQLite (tri top-k sur la plage de la clé primaire)"""
+        async with self.conn.execute(
+            "SELECT user_id FROM giveaway_entries WHERE message_id = ? ORDER BY random() LIMIT ?",
+            (message_id, count)
+        ) as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def get_giveaway_deadlines(self):
+        """(message_id, end_time) des giveaways en cours, via l'index (ended, end_time)"""
+        async with self.conn.execute(
+            "SELECT message_id, end_time FROM giveaways WHERE ended = 0 ORDER BY end_time"
         ) as cursor:
             return await cursor.fetchall()
 
+    async def get_giveaway(self, message_id: int):
+        async with self.conn.execute(
+            "SELECT * FROM giveaways WHERE message_id = ?", (message_id,)
+        ) as cursor:
+            return await cursor.fetchone()
+
     async def end_giveaway(self, message_id: int):
         await self.conn.execute(
             "UPDATE giveaways SET ended = 1 WHERE message_id = ?", (message_id,)
         )
-        await self.conn.commit()
+        await self.commit()
+
+    # Reminders
+    async def add_reminder(self, user_id: int, guild_id: int, channel_id: int,
+                           content: str, due: int, created_at: int) -> int:
+        async with self.write_cursor(
+            """INSERT INTO reminders (user_id, guild_id, channel_id, content, due, created_at)
+            VALUES (?, ?, ?, ?, ?, ?) RETURNING id""",
+            (user_id, guild_id, channel_id, content, due, created_at)
+        ) as cursor:
+            reminder_id = (await cursor.fetchone())[0]
+        await self.commit()
+        return reminder_id
+
+    async def get_due_reminders(self, now: int, limit: int):
+        async with self.conn.execute(
+            "SELECT id, user_id, channel_id, content FROM reminders WHERE due <= ? ORDER BY due LIMIT ?",
+            (now, limit)
+        ) as cursor:
+            return await cursor.fetchall()
+
+    async def next_reminder_due(self) -> Optional[int]:
+        async with self.conn.execute("SELECT MIN(due) FROM reminders") as cursor:
+            return (await cursor.fetchone())[0]
+
+    async def delete_reminders(self, reminder_ids: list):
+        await self.conn.executemany(
+            "DELETE FROM reminders WHERE id = ?", [(rid,) for rid in reminder_ids]
+        )
+        await self.commit()
+
+    async def get_user_reminders(self, user_id: int, limit: int = 10):
+        async with self.conn.execute(
+            "SELECT id, due, content FROM reminders WHERE user_id = ? ORDER BY due LIMIT ?",
+            (user_id, limit)
+        ) as cursor:
+            return await cursor.fetchall()
+
+    async def count_user_reminders(self, user_id: int) -> int:
+        async with self.conn.execute(
+            "SELECT COUNT(*) FROM reminders WHERE user_id = ?", (user_id,)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+    async def cancel_reminder(self, user_id: int, reminder_id: int) -> bool:
+        async with self.write_cursor(
+            "DELETE FROM reminders WHERE id = ? AND user_id = ? RETURNING id", (reminder_id, user_id)
+        ) as cursor:
+            deleted = await cursor.fetchone()
+        await self.commit()
+        return deleted is not None
+
+    # Polls
+    async def create_poll(self, message_id: int, guild_id: int, channel_id: int,
+                          question: str, options: list, creator_id: int):
+        await self.conn.execute(
+            """INSERT INTO polls (message_id, guild_id, channel_id, question, options, creator_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (message_id, guild_id, channel_id, question, json.dumps(options), creator_id,
+             int(datetime.datetime.now().timestamp()))
+        )
+        await self.commit()
+
+    async def get_poll(self, message_id: int) -> Optional[tuple]:
+        """(question, options) ou None"""
+        async with self.conn.execute(
+            "SELECT question, options FROM polls WHERE message_id = ?", (message_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    async def get_poll_tallies(self, message_id: int):
+        async with self.conn.execute(
+            "SELECT option, COUNT(*) FROM poll_votes WHERE message_id = ? GROUP BY option", (message_id,)
+        ) as cursor:
+            return await cursor.fetchall()
+
+    async def set_poll_vote(self, message_id: int, user_id: int, option: int) -> Optional[int]:
+        """Enregistre le vote et retourne l'option précédente du membre (None si premier vote)"""
+        async with self.conn.execute(
+            "SELECT option FROM poll_votes WHERE message_id = ? AND user_id = ?", (message_id, user_id)
+        ) as cursor:
+            row = await cursor.fetchone()
+        previous = row[0] if row else None
+        if previous != option:
+            await self.conn.execute(
+                """INSERT INTO poll_votes (message_id, user_id, option) VALUES (?, ?, ?)
+                ON CONFLICT(message_id, user_id) DO UPDATE SET option = excluded.option""",
+                (message_id, user_id, option)
+            )
+            await self.commit()
+        return previous
 
     # Custom Commands
     async def add_custom_command(self, guild_id: int, name: str, response: str, creator_id: int):
@@ -318,7 +2020,7 @@ class Database:
             VALUES (?, ?, ?, ?) ON CONFLICT(guild_id, name) DO UPDATE SET response = ?""",
             (guild_id, name.lower(), response, creator_id, response)
         )
-        await self.conn.commit()
+        await self.commit()
 
     async def get_custom_command(self, guild_id: int, name: str):
         async with self.conn.execute(
@@ -328,17 +2030,31 @@ class Database:
             return await cursor.fetchone()
 
     async def get_all_custom_commands(self, guild_id: int):
-        async with self.conn.execute(
+        async with self.reader() as conn, conn.execute(
             "SELECT * FROM custom_commands WHERE guild_id = ?", (guild_id,)
         ) as cursor:
             return await cursor.fetchall()
 
+    async def get_custom_command_responses(self, guild_id: int):
+        """(nom, réponse) du serveur; lu sur la connexion d'écriture pour voir les ajouts pas encore validés"""
+        async with self.conn.execute(
+            "SELECT name, response FROM custom_commands WHERE guild_id = ?", (guild_id,)
+        ) as cursor:
+            return await cursor.fetchall()
+
     async def delete_custom_command(self, guild_id: int, name: str):
         await self.conn.execute(
             "DELETE FROM custom_commands WHERE guild_id = ? AND name = ?",
             (guild_id, name.lower())
         )
-        await self.conn.commit()
+        await self.commit()
+
+    async def add_custom_command_uses(self, rows: list):
+        """rows: [(incrément, guild_id, nom)]"""
+        await self.conn.executemany(
+            "UPDATE custom_commands SET uses = uses + ? WHERE guild_id = ? AND name = ?", rows
+        )
+        await self.commit()
 
     # Shop
     async def add_shop_item(self, guild_id: int, name: str, description: str,
@@ -348,14 +2064,27 @@ class Database:
             VALUES (?, ?, ?, ?, ?, ?)""",
             (guild_id, name, description, price, role_id, stock)
         )
-        await self.conn.commit()
+        await self.commit()
 
     async def get_shop_items(self, guild_id: int):
-        async with self.conn.execute(
+        async with self.reader() as conn, conn.execute(
             "SELECT * FROM shop_items WHERE guild_id = ?", (guild_id,)
         ) as cursor:
             return await cursor.fetchall()
 
+    async def take_shop_stock(self, item_id: int) -> bool:
+        """Décrémente le stock si disponible (-1 = illimité); False si rupture ou supprimé"""
+        async with self.write_cursor(
+            """UPDATE shop_items SET stock = CASE WHEN stock > 0 THEN stock - 1 ELSE stock END
+            WHERE id = ? AND stock != 0 RETURNING id""",
+            (item_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return False
+        await self.commit()
+        return True
+
     async def get_shop_item(self, item_id: int):
         async with self.conn.execute(
             "SELECT * FROM shop_items WHERE id = ?", (item_id,)
@@ -365,12 +2094,540 @@ class Database:
     # Leaderboard
     async def get_leaderboard(self, guild_id: int, category: str = "xp", limit: int = 10):
         column = "xp" if category == "xp" else "balance + bank"
-        async with self.conn.execute(
+        async with self.reader() as conn, conn.execute(
             f"SELECT user_id, {column} as total FROM users WHERE guild_id = ? ORDER BY total DESC LIMIT ?",
             (guild_id, limit)
         ) as cursor:
             return await cursor.fetchall()
 
+    async def get_leaderboard_page(self, guild_id: int, category: str = "xp",
+                                   page: int = 1, per_page: int = 10) -> list:
+        """Page du classement servie depuis la mémoire (SQL seulement pour le préchauffage)"""
+        offset = (page - 1) * per_page
+        board = self.leaderboards.get(guild_id, category)
+        if board is None:
+            rows = await self.get_leaderboard(guild_id, category, self.leaderboards.size)
+            board = self.leaderboards.warm(guild_id, category, rows)
+
+        if offset + per_page <= board.size or board.complete:
+            return board.page(offset, per_page)
+
+        # Au-delà du top-K gardé en mémoire
+        column = "xp" if category == "xp" else "balance + bank"
+        async with self.reader() as conn, conn.execute(
+            f"SELECT user_id, {column} as total FROM users WHERE guild_id = ? ORDER BY total DESC LIMIT ? OFFSET ?",
+            (guild_id, per_page, offset)
+        ) as cursor:
+            return await cursor.fetchall()
+
+    async def get_rank(self, guild_id: int, score: int, category: str = "xp") -> int:
+        """Position exacte d'un score dans le classement (parcours de l'index, pas de tri)"""
+        column = "xp" if category == "xp" else "balance + bank"
+        async with self.reader() as conn, conn.execute(
+            f"SELECT COUNT(*) + 1 FROM users WHERE guild_id = ? AND {column} > ?",
+            (guild_id, score)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+
+class TopKBoard:
+    """Top-K d'un classement, trié par score décroissant"""
+    __slots__ = ("size", "entries", "scores", "complete")
+
+    def __init__(self, size: int, rows: list):
+        self.size = size
+        # (-score, user_id) en ordre croissant = score décroissant
+        self.entries = sorted((-score, user_id) for user_id, score in rows)
+        self.scores = {user_id: score for user_id, score in rows}
+        # Moins de K lignes: le serveur entier tient dans le classement
+        self.complete = len(rows) < size
+
+    def update(self, user_id: int, score: int) -> bool:
+        """Applique un nouveau score; retourne False si le classement doit être rechargé"""
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            del self.entries[bisect.bisect_left(self.entries, (-old, user_id))]
+
+        lowest = -self.entries[-1][0] if self.entries else None
+        if self.complete or lowest is None or score > lowest:
+            bisect.insort(self.entries, (-score, user_id))
+            self.scores[user_id] = score
+            if len(self.entries) > self.size:
+                _, evicted = self.entries.pop()
+                del self.scores[evicted]
+                self.complete = False
+            return True
+
+        # Un membre du top-K est passé sous la dernière place: son remplaçant est inconnu
+        return old is None
+
+    def page(self, offset: int, limit: int) -> list:
+        return [(user_id, -neg) for neg, user_id in self.entries[offset:offset + limit]]
+
+
+class LeaderboardCache:
+    """Classements par serveur et par catégorie, LRU sur les serveurs"""
+
+    def __init__(self, size: int = 500, max_guilds: int = 200):
+        self.size = size
+        self.max_guilds = max_guilds
+        self.boards: OrderedDict = OrderedDict()  # (guild_id, category) -> TopKBoard
+        self.hits = 0
+        self.warms = 0
+
+    def get(self, guild_id: int, category: str) -> Optional[TopKBoard]:
+        board = self.boards.get((guild_id, category))
+        if board is not None:
+            self.boards.move_to_end((guild_id, category))
+            self.hits += 1
+        return board
+
+    def covers(self, guild_id: int, category: str, offset: int, count: int) -> bool:
+        """True si la tranche est servie par le top-K en mémoire, sans lecture SQL"""
+        board = self.boards.get((guild_id, category))
+        return board is not None and (offset + count <= board.size or board.complete)
+
+    def warm(self, guild_id: int, category: str, rows: list) -> TopKBoard:
+        board = TopKBoard(self.size, rows)
+        self.boards[(guild_id, category)] = board
+        self.warms += 1
+        while len(self.boards) > self.max_guilds * 2:
+            self.boards.popitem(last=False)
+        return board
+
+    def update(self, guild_id: int, user_id: int, category: str, score: int):
+        board = self.boards.get((guild_id, category))
+        if board is not None and not board.update(user_id, score):
+            del self.boards[(guild_id, category)]
+
+
+CUSTOM_COMMAND_FIELDS = ("user", "username", "server")
+
+
+def compile_response(template: str) -> tuple:
+    """Découpe une réponse personnalisée une fois pour toutes: ((texte, champ ou None), ...)"""
+    try:
+        parts = []
+        for literal, field, _, _ in string.Formatter().parse(template):
+            if field is not None and field not in CUSTOM_COMMAND_FIELDS:
+                # Champ inconnu: gardé tel quel plutôt que de faire échouer la commande
+                literal, field = literal + "{" + field + "}", None
+            parts.append((literal, field))
+        return tuple(parts)
+    except ValueError:
+        return ((template, None),)
+
+
+def render_response(parts: tuple, values: dict) -> str:
+    return "".join(literal + values[field] if field else literal for literal, field in parts)
+
+
+class CustomCommandIndex:
+    """Index nom -> réponse compilée par serveur, chargé à la demande (LRU).
+
+    Un serveur chargé est complet: un nom absent est un miss sans requête SQL.
+    Les utilisations sont comptées en mémoire et écrites par lots."""
+
+    def __init__(self, db: "Database", max_guilds: int = 1000):
+        self.db = db
+        self.max_guilds = max_guilds
+        self.guilds: OrderedDict = OrderedDict()  # guild_id -> {nom: parties compilées}
+        # Incrémenté à chaque modification: un chargement concurrent n'est alors pas mis en cache
+        self.epoch = 0
+        self.pending_uses: dict = {}  # (guild_id, nom) -> utilisations non écrites
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    async def _index(self, guild_id: int) -> dict:
+        index = self.guilds.get(guild_id)
+        if index is None:
+            epoch = self.epoch
+            rows = await self.db.get_custom_command_responses(guild_id)
+            index = {name: compile_response(response) for name, response in rows}
+            self.loads += 1
+            if epoch == self.epoch:
+                self.guilds[guild_id] = index
+                while len(self.guilds) > self.max_guilds:
+                    self.guilds.popitem(last=False)
+            return index
+        self.guilds.move_to_end(guild_id)
+        return index
+
+    async def get(self, guild_id: int, name: str) -> Optional[tuple]:
+        """Réponse compilée, et comptage de l'utilisation; None si la commande n'existe pas"""
+        parts = (await self._index(guild_id)).get(name)
+        if parts is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        key = (guild_id, name)
+        self.pending_uses[key] = self.pending_uses.get(key, 0) + 1
+        return parts
+
+    def set(self, guild_id: int, name: str, response: str):
+        self.epoch += 1
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            index[name.lower()] = compile_response(response)
+
+    def remove(self, guild_id: int, name: str):
+        self.epoch += 1
+        self.pending_uses.pop((guild_id, name.lower()), None)
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            index.pop(name.lower(), None)
+
+    async def flush(self):
+        if not self.pending_uses:
+            return
+        batch, self.pending_uses = self.pending_uses, {}
+        try:
+            await self.db.add_custom_command_uses(
+                [(count, guild_id, name) for (guild_id, name), count in batch.items()]
+            )
+        except Exception:
+            for key, count in batch.items():
+                self.pending_uses[key] = self.pending_uses.get(key, 0) + count
+            raise
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "guilds": len(self.guilds),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "hit_rate": (self.hits / total * 100) if total else 0.0,
+            "pending_uses": sum(self.pending_uses.values())
+        }
+
+
+class XPBuffer:
+    """Accumule les gains d'XP en mémoire et les écrit en base par lots"""
+
+    def __init__(self, db: Database, max_pending: int = 500, max_cached: int = 10000):
+        self.db = db
+        self.max_pending = max_pending
+        self.max_cached = max_cached
+        # (guild_id, user_id) -> [xp, level, messages] tel que vu par le bot
+        self.state: OrderedDict = OrderedDict()
+        # (guild_id, user_id) -> [xp_delta, messages_delta] pas encore écrits
+        self.pending: dict = {}
+
+    async def add_xp(self, guild_id: int, user_id: int, amount: int) -> tuple:
+        """Ajoute de l'XP et retourne (ancien niveau, nouveau niveau) immédiatement"""
+        key = (guild_id, user_id)
+        entry = self.state.get(key)
+        if entry is None:
+            user = await self.db.get_user_fields(user_id, guild_id, "xp", "level", "messages")
+            entry = self.state.setdefault(key, [user["xp"], user["level"], user["messages"]])
+        self.state.move_to_end(key)
+
+        old_level = entry[1]
+        entry[0] += amount
+        entry[2] += 1
+        # Calcul du niveau (formule: niveau = sqrt(xp/100))
+        entry[1] = int((entry[0] / 100) ** 0.5)
+        self.db.leaderboards.update(guild_id, user_id, "xp", entry[0])
+
+        delta = self.pending.setdefault(key, [0, 0])
+        delta[0] += amount
+        delta[1] += 1
+
+        if len(self.pending) >= self.max_pending:
+            await self.flush()
+        return old_level, entry[1]
+
+    def discard(self, guild_id: int, user_id: int):
+        """Oublie l'état d'un membre (ex: XP redéfini par un admin)"""
+        key = (guild_id, user_id)
+        self.state.pop(key, None)
+        self.pending.pop(key, None)
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        rows = [
+            (xp, messages, self.state[key][1], key[1], key[0])
+            for key, (xp, messages) in batch.items()
+        ]
+        try:
+            await self.db.apply_xp_batch(rows)
+        except Exception:
+            # On remet les deltas en attente pour le prochain flush
+            for key, (xp, messages) in batch.items():
+                delta = self.pending.setdefault(key, [0, 0])
+                delta[0] += xp
+                delta[1] += messages
+            raise
+
+        # Éviction des membres inactifs (seulement ceux sans delta en attente)
+        while len(self.state) > self.max_cached:
+            key = next(iter(self.state))
+            if key in self.pending:
+                break
+            self.state.popitem(last=False)
+
+
+MAX_REMINDERS_PER_USER = 25
+
+
+class TimerScheduler:
+    """Échéances dans un tas min: dort jusqu'à la prochaine, exécute les tâches dues en parallèle borné.
+
+    Les échéances elles-mêmes vivent en base; le tas est rechargé au démarrage."""
+
+    def __init__(self, concurrency: int = 8, max_sleep: float = 3600):
+        self.concurrency = concurrency
+        self.max_sleep = max_sleep  # revalide périodiquement contre l'horloge murale
+        # (échéance, ordre, type, clé); les entrées annulées ou replanifiées sont ignorées
+        self.heap: list = []
+        self.deadlines: dict = {}  # (type, clé) -> échéance courante
+        self.handlers: dict = {}  # type -> coroutine(clé)
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._runner = None
+        self._tasks: set = set()
+        self.fired = 0
+
+    def register(self, kind: str, handler):
+        self.handlers[kind] = handler
+
+    def schedule(self, kind: str, key, deadline: float):
+        self.deadlines[(kind, key)] = deadline
+        earliest = self.heap[0][0] if self.heap else None
+        heapq.heappush(self.heap, (deadline, next(self._order), kind, key))
+        # Réveil seulement si la nouvelle échéance passe devant
+        if earliest is None or deadline < earliest:
+            self._wakeup.set()
+
+    def cancel(self, kind: str, key):
+        self.deadlines.pop((kind, key), None)
+
+    def deadline(self, kind: str, key) -> Optional[float]:
+        return self.deadlines.get((kind, key))
+
+    def start(self, wait_for=None):
+        """wait_for: coroutine attendue avant le premier déclenchement (ex: cache des salons prêt)"""
+        self._runner = asyncio.create_task(self._run(wait_for))
+
+    async def _run(self, wait_for):
+        if wait_for is not None:
+            await wait_for
+        while True:
+            self._wakeup.clear()
+            if not self.heap:
+                await self._wakeup.wait()
+                continue
+            delay = self.heap[0][0] - time.time()
+            if delay > 0:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), min(delay, self.max_sleep))
+                continue
+
+            deadline, _, kind, key = heapq.heappop(self.heap)
+            if self.deadlines.get((kind, key)) != deadline:
+                continue
+            del self.deadlines[(kind, key)]
+            await self._semaphore.acquire()
+            task = asyncio.create_task(self._fire(kind, key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fire(self, kind: str, key):
+        try:
+            await self.handlers[kind](key)
+        except Exception as e:
+            print(f"Erreur minuterie {kind} {key}: {e}")
+        finally:
+            self.fired += 1
+            self._semaphore.release()
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            self._runner = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.deadlines),
+            "running": len(self._tasks),
+            "fired": self.fired
+        }
+
+
+class CooldownStore:
+    """Cooldowns en mémoire (XP, work, daily) avec expiration par tas et instantané disque"""
+
+    def __init__(self, snapshot_path: Optional[str] = "cooldowns.json"):
+        self.snapshot_path = snapshot_path
+        # (kind, guild_id, user_id) -> (début, expiration)
+        self.entries: dict = {}
+        # (expiration, clé); les entrées remplacées sont ignorées à l'expiration
+        self.heap: list = []
+        self.dirty = False
+
+    def start(self, kind: str, guild_id: int, user_id: int, now: float, duration: float):
+        key = (kind, guild_id, user_id)
+        expires = now + duration
+        self.entries[key] = (now, expires)
+        heapq.heappush(self.heap, (expires, key))
+        self.dirty = True
+
+    def remaining(self, kind: str, guild_id: int, user_id: int, now: float, duration: float) -> float:
+        """Secondes restantes (0 si disponible); la durée actuelle de la config fait foi"""
+        entry = self.entries.get((kind, guild_id, user_id))
+        if entry is None:
+            return 0
+        return max(0, entry[0] + duration - now)
+
+    def expire(self, now: float) -> int:
+        expired = 0
+        while self.heap and self.heap[0][0] <= now:
+            expires, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] == expires:
+                del self.entries[key]
+                expired += 1
+        if expired:
+            self.dirty = True
+        return expired
+
+    def load(self, now: float):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Instantané des cooldowns ignoré: {e}")
+            return
+        for kind, guild_id, user_id, started, expires in rows:
+            if expires > now:
+                self.entries[(kind, guild_id, user_id)] = (started, expires)
+                self.heap.append((expires, (kind, guild_id, user_id)))
+        heapq.heapify(self.heap)
+
+    async def save(self):
+        """Écrit l'instantané (fichier temporaire puis remplacement atomique)"""
+        if not self.snapshot_path or not self.dirty:
+            return
+        rows = [[*key, started, expires] for key, (started, expires) in self.entries.items()]
+        self.dirty = False
+        await asyncio.to_thread(self._write, json.dumps(rows))
+
+    def _write(self, data: str):
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.snapshot_path)
+
+    def stats(self) -> dict:
+        return {"entries": len(self.entries), "heap": len(self.heap)}
+
+
+@dataclass(slots=True)
+class PollState:
+    question: str
+    options: list
+    counts: list
+    lock: asyncio.Lock
+    last_render: float = 0.0
+
+
+class PollManager:
+    """Sondages persistés: décomptes tenus incrémentalement, au plus un rendu d'embed par intervalle"""
+
+    def __init__(self, db: "Database", render_interval: float = 2.0, max_cached: int = 500):
+        self.db = db
+        self.render_interval = render_interval
+        self.max_cached = max_cached
+        self.polls: OrderedDict = OrderedDict()  # message_id -> PollState
+        self.pending: dict = {}  # message_id -> tâche de rendu programmée
+        self._load_lock = asyncio.Lock()
+        self.votes = 0
+        self.renders = 0
+
+    async def _acquire(self, message_id: int) -> Optional[PollState]:
+        """Retourne le sondage avec son verrou pris (à libérer par l'appelant), ou None s'il est inconnu"""
+        while True:
+            poll = self.polls.get(message_id)
+            if poll is None:
+                async with self._load_lock:
+                    poll = self.polls.get(message_id)
+                    if poll is None:
+                        row = await self.db.get_poll(message_id)
+                        if row is None:
+                            return None
+                        counts = [0] * len(row[1])
+                        for option, count in await self.db.get_poll_tallies(message_id):
+                            counts[option] = count
+                        poll = PollState(row[0], row[1], counts, asyncio.Lock())
+                        # Verrouillé avant d'être visible: l'éviction ne peut pas le retirer
+                        await poll.lock.acquire()
+                        self.polls[message_id] = poll
+                        self._evict()
+                        return poll
+            await poll.lock.acquire()
+            if self.polls.get(message_id) is poll:
+                self.polls.move_to_end(message_id)
+                return poll
+            # Évincé pendant l'attente du verrou: on recharge les décomptes depuis la base
+            poll.lock.release()
+
+    def _evict(self):
+        # Les sondages en cours de vote ou de rendu restent en mémoire
+        for message_id in list(self.polls)[:max(0, len(self.polls) - self.max_cached)]:
+            if message_id not in self.pending and not self.polls[message_id].lock.locked():
+                del self.polls[message_id]
+
+    async def vote(self, message: discord.Message, user_id: int, option: int) -> Optional[str]:
+        """Enregistre le vote et retourne le libellé choisi, ou None si le sondage est inconnu"""
+        poll = await self._acquire(message.id)
+        if poll is None:
+            return None
+        try:
+            if option >= len(poll.options):
+                return None
+            previous = await self.db.set_poll_vote(message.id, user_id, option)
+            if previous != option:
+                if previous is not None:
+                    poll.counts[previous] -= 1
+                poll.counts[option] += 1
+                self.votes += 1
+                self._schedule_render(message, poll)
+            return poll.options[option]
+        finally:
+            poll.lock.release()
+
+    def _schedule_render(self, message: discord.Message, poll: PollState):
+        if message.id in self.pending:
+            return
+        delay = max(0.0, poll.last_render + self.render_interval - time.monotonic())
+        self.pending[message.id] = asyncio.create_task(self._render_later(message, poll, delay))
+
+    async def _render_later(self, message: discord.Message, poll: PollState, delay: float):
+        await asyncio.sleep(delay)
+        # Retiré avant l'édition: un vote pendant l'appel programme le rendu suivant
+        del self.pending[message.id]
+        poll.last_render = time.monotonic()
+        self.renders += 1
+        with contextlib.suppress(discord.HTTPException):
+            await message.edit(embed=poll_embed(poll.question, poll.options, poll.counts))
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self.polls),
+            "pending": len(self.pending),
+            "votes": self.votes,
+            "renders": self.renders
+        }
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # BOT PRINCIPAL
@@ -380,19 +2637,53 @@ class UltraBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.all()
         super().__init__(command_prefix=self.get_prefix, intents=intents)
-        self.db = Database()
-        self.xp_cooldowns = defaultdict(dict)
-        self.spam_tracker = defaultdict(list)
+        self.db = Database(
+            group_commit=os.getenv("ULTRABOT_GROUP_COMMIT", "0") == "1",
+            max_commit_latency=float(os.getenv("ULTRABOT_COMMIT_LATENCY_MS", "10")) / 1000
+        )
+        self.xp_buffer = XPBuffer(self.db)
+        self.custom_commands = CustomCommandIndex(self.db)
+        self.cooldowns = CooldownStore(os.getenv("ULTRABOT_COOLDOWNS", "cooldowns.json"))
+        self.spam_tracker = SpamTracker()
+        self.duplicate_tracker = DuplicateTracker()
+        self.deletion_queue = DeletionQueue()
+        self.raid_detector = RaidDetector()
+        self.raid_actions = RaidActionQueue()
+        self.raid_actions.on_batch = self.log_raid_batch
+        self.verdict_cache = VerdictCache()
+        self.scheduler = TimerScheduler()
+        # Une seule livraison de rappels à la fois
+        self.reminder_lock = asyncio.Lock()
+        self.polls = PollManager(self.db)
+        self.heavy_rules = HeavyRuleExecutor(workers=int(os.getenv("ULTRABOT_AUTOMOD_WORKERS", "2")))
+        # Ajouts d'auto-rôle simultanés pendant un raid
+        self.join_role_semaphore = asyncio.Semaphore(4)
 
     async def get_prefix(self, message: discord.Message):
         if not message.guild:
             return "!"
-        config = await self.db.get_guild_config(message.guild.id)
-        return commands.when_mentioned_or(config["prefix"])(self, message)
+        config = await self.db.get_config(message.guild.id)
+        return commands.when_mentioned_or(config.prefix)(self, message)
 
     async def setup_hook(self):
         await self.db.connect()
-        self.check_giveaways.start()
+        self.heavy_rules.start()
+        self.cooldowns.load(datetime.datetime.now().timestamp())
+        for name, detail in await self.db.check_query_plans():
+            print(f"⚠️ Requête non indexée ({name}): {detail}")
+        self.add_view(GiveawayEntryView())
+        # custom_id fixes: une vue répond aux boutons de tous les sondages, même d'avant le redémarrage
+        self.add_view(PollView([str(i + 1) for i in range(5)]))
+        self.scheduler.register("giveaway", self.finish_giveaway)
+        for message_id, end_time in await self.db.get_giveaway_deadlines():
+            self.scheduler.schedule("giveaway", message_id, end_time)
+        # Une seule minuterie pour tous les rappels: la prochaine échéance en base
+        self.scheduler.register("reminders", self.deliver_reminders)
+        await self.schedule_next_reminder()
+        # Les giveaways et rappels en retard partent dès que le cache des salons est prêt
+        self.scheduler.start(self.wait_until_ready())
+        self.flush_xp.start()
+        self.sweep_memory.start()
         await self.tree.sync()
         print(f"✅ Commandes synchronisées!")
 
@@ -415,47 +2706,184 @@ class UltraBot(commands.Bot):
         )
         print(f"✅ Bot prêt et commandes slash synchronisées !")
 
-    @tasks.loop(seconds=30)
-    async def check_giveaways(self):
-        """Vérifie et termine les giveaways expirés"""
-        giveaways = await self.db.get_active_giveaways()
-        now = int(datetime.datetime.now().timestamp())
-
-        for giveaway in giveaways:
-            if giveaway[6] <= now:  # end_time
-                try:
-                    channel = self.get_channel(giveaway[2])
-                    if channel:
-                        message = await channel.fetch_message(giveaway[1])
-                        reaction = discord.utils.get(message.reactions, emoji="🎉")
-
-                        if reaction:
-                            users = [u async for u in reaction.users() if not u.bot]
-                            winners_count = min(giveaway[5], len(users))
-
-                            if winners_count > 0:
-                                winners = random.sample(users, winners_count)
-                                winners_text = ", ".join(w.mention for w in winners)
-
-                                embed = discord.Embed(
-                                    title="🎉 GIVEAWAY TERMINÉ 🎉",
-                                    description=f"**Prix:** {giveaway[4]}\n**Gagnant(s):** {winners_text}",
-                                    color=discord.Color.gold()
-                                )
-                                await message.edit(embed=embed)
-                                await channel.send(f"🎊 Félicitations {winners_text} ! Vous avez gagné **{giveaway[4]}** !")
-                            else:
-                                embed = discord.Embed(
-                                    title="🎉 GIVEAWAY TERMINÉ 🎉",
-                                    description=f"**Prix:** {giveaway[4]}\n**Aucun participant** 😢",
-                                    color=discord.Color.red()
-                                )
-                                await message.edit(embed=embed)
-
-                    await self.db.end_giveaway(giveaway[1])
-                except Exception as e:
-                    print(f"Erreur giveaway: {e}")
-                    await self.db.end_giveaway(giveaway[1])
+    async def close(self):
+        # Écrire l'XP encore en mémoire avant de fermer la base
+        self.flush_xp.cancel()
+        self.sweep_memory.cancel()
+        await self.scheduler.stop()
+        try:
+            await self.deletion_queue.flush_all()
+            await self.raid_actions.flush_all()
+            await self.xp_buffer.flush()
+            await self.custom_commands.flush()
+            await self.cooldowns.save()
+        finally:
+            self.heavy_rules.shutdown()
+            await self.db.close()
+            await super().close()
+
+    async def log_moderation(self, guild: discord.Guild, text: str):
+        """Message dans le salon de logs de modération, s'il est défini"""
+        config = await self.db.get_config(guild.id)
+        channel = guild.get_channel(config.moderation.log_channel) if config.moderation.log_channel else None
+        if channel:
+            with contextlib.suppress(discord.HTTPException):
+                await channel.send(text)
+
+    async def log_raid_batch(self, guild: discord.Guild, action: str, done: int, failed: int):
+        verb = "expulsés" if action == "kick" else "mis en timeout"
+        text = f"🚨 Anti-raid: **{done}** membres {verb}"
+        if failed:
+            text += f" ({failed} échecs)"
+        await self.log_moderation(guild, text)
+
+    @tasks.loop(seconds=10)
+    async def flush_xp(self):
+        """Écrit les gains d'XP et les utilisations de commandes personnalisées accumulés"""
+        try:
+            await self.xp_buffer.flush()
+        except Exception as e:
+            print(f"Erreur flush XP: {e}")
+        try:
+            await self.custom_commands.flush()
+        except Exception as e:
+            print(f"Erreur flush commandes personnalisées: {e}")
+
+    @tasks.loop(seconds=60)
+    async def sweep_memory(self):
+        """Libère les compteurs anti-spam et les cooldowns expirés, puis sauvegarde ces derniers"""
+        now = datetime.datetime.now().timestamp()
+        self.spam_tracker.sweep(now)
+        self.duplicate_tracker.sweep(now)
+        self.cooldowns.expire(now)
+        for guild_id, joins in self.raid_detector.ended(now):
+            guild = self.get_guild(guild_id)
+            if guild:
+                await self.log_moderation(guild, f"✅ Fin du mode raid: **{joins}** arrivées pendant le raid.")
+        try:
+            await self.cooldowns.save()
+        except OSError as e:
+            print(f"Erreur sauvegarde cooldowns: {e}")
+
+    async def schedule_next_reminder(self):
+        due = await self.db.next_reminder_due()
+        if due is None:
+            self.scheduler.cancel("reminders", 0)
+        else:
+            self.scheduler.schedule("reminders", 0, due)
+
+    async def add_reminder(self, user_id: int, guild_id: int, channel_id: int, content: str, due: int) -> int:
+        reminder_id = await self.db.add_reminder(
+            user_id, guild_id, channel_id, content, due, int(time.time())
+        )
+        # Pendant une livraison, c'est elle qui replanifiera depuis la base
+        if not self.reminder_lock.locked():
+            current = self.scheduler.deadline("reminders", 0)
+            if current is None or due < current:
+                self.scheduler.schedule("reminders", 0, due)
+        return reminder_id
+
+    async def deliver_reminders(self, _key=None, batch_size: int = 500):
+        """Livre par lots tous les rappels échus, puis se replanifie sur le suivant"""
+        async with self.reminder_lock:
+            try:
+                await self._deliver_due_reminders(batch_size)
+            finally:
+                await self.schedule_next_reminder()
+
+    async def _deliver_due_reminders(self, batch_size: int):
+        now = int(time.time())
+        semaphore = asyncio.Semaphore(10)
+
+        while True:
+            rows = await self.db.get_due_reminders(now, batch_size)
+            if not rows:
+                break
+            # Lot réclamé avant l'envoi : un rappel n'est jamais livré deux fois
+            await self.db.delete_reminders([row[0] for row in rows])
+            # Salon -> lignes à poster quand le MP est impossible (un message par salon)
+            fallbacks = {}
+
+            async def send(reminder_id: int, user_id: int, channel_id: int, content: str):
+                async with semaphore:
+                    try:
+                        user = self.get_user(user_id) or await self.fetch_user(user_id)
+                        await user.send(f"⏰ **Rappel:** {content}")
+                    except discord.HTTPException:
+                        fallbacks.setdefault(channel_id, []).append(f"⏰ <@{user_id}> **Rappel:** {content}")
+
+            results = await asyncio.gather(*(send(*row) for row in rows), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Erreur envoi rappel: {result!r}")
+            for channel_id, lines in fallbacks.items():
+                # Les salons de MP ne sont généralement pas en cache: on les récupère via l'API
+                channel = self.get_channel(channel_id)
+                if channel is None:
+                    try:
+                        channel = await self.fetch_channel(channel_id)
+                    except discord.HTTPException as e:
+                        print(f"⚠️ {len(lines)} rappel(s) non livré(s), salon {channel_id} inaccessible: {e}")
+                        continue
+                chunks = []
+                chunk = ""
+                for line in lines:
+                    if chunk and len(chunk) + len(line) + 1 > 2000:
+                        chunks.append(chunk)
+                        chunk = ""
+                    chunk = f"{chunk}\n{line}" if chunk else line[:2000]
+                chunks.append(chunk)
+                for chunk in chunks:
+                    try:
+                        await channel.send(chunk)
+                    except discord.HTTPException as e:
+                        print(f"⚠️ Rappels non livrés dans le salon {channel_id}: {e}")
+
+            if len(rows) < batch_size:
+                break
+
+    async def finish_giveaway(self, message_id: int):
+        """Termine un giveaway arrivé à échéance (appelé par le planificateur)"""
+        giveaway = await self.db.get_giveaway(message_id)
+        if giveaway is None or giveaway[7]:  # ended
+            return
+        try:
+            channel = self.get_channel(giveaway[2])
+            if channel:
+                if giveaway[9] == "button":  # mode
+                    # Participations en base: tirage par requête indexée, sans parcourir l'API
+                    message = channel.get_partial_message(giveaway[1])
+                    mentions = [f"<@{uid}>" for uid in await self.db.draw_giveaway_entries(giveaway[1], giveaway[5])]
+                else:
+                    message = await channel.fetch_message(giveaway[1])
+                    reaction = discord.utils.get(message.reactions, emoji="🎉")
+                    mentions = []
+                    if reaction:
+                        # Échantillonnage en flux: mémoire O(gagnants) quel que soit le nombre de participants
+                        winners, _ = await reservoir_sample(
+                            (u async for u in reaction.users() if not u.bot), giveaway[5]
+                        )
+                        mentions = [w.mention for w in winners]
+
+                if mentions:
+                    winners_text = ", ".join(mentions)
+                    embed = discord.Embed(
+                        title="🎉 GIVEAWAY TERMINÉ 🎉",
+                        description=f"**Prix:** {giveaway[4]}\n**Gagnant(s):** {winners_text}",
+                        color=discord.Color.gold()
+                    )
+                    await message.edit(embed=embed, view=None)
+                    await channel.send(f"🎊 Félicitations {winners_text} ! Vous avez gagné **{giveaway[4]}** !")
+                else:
+                    embed = discord.Embed(
+                        title="🎉 GIVEAWAY TERMINÉ 🎉",
+                        description=f"**Prix:** {giveaway[4]}\n**Aucun participant** 😢",
+                        color=discord.Color.red()
+                    )
+                    await message.edit(embed=embed, view=None)
+        except Exception as e:
+            print(f"Erreur giveaway: {e}")
+        await self.db.end_giveaway(giveaway[1])
 
 
 bot = UltraBot()
@@ -496,23 +2924,19 @@ class TicketCategorySelect(discord.ui.Select):
         )
 
     async def callback(self, interaction: discord.Interaction):
-        config = await bot.db.get_guild_config(interaction.guild.id)
+        config = await bot.db.get_config(interaction.guild.id)
         category_name = self.values[0]
 
         # Vérifier si l'utilisateur a déjà un ticket ouvert
-        existing = await bot.db.conn.execute(
-            "SELECT * FROM tickets WHERE user_id = ? AND guild_id = ? AND status = 'open'",
-            (interaction.user.id, interaction.guild.id)
-        )
-        if await existing.fetchone():
+        if await bot.db.get_open_ticket(interaction.user.id, interaction.guild.id):
             return await interaction.response.send_message(
                 "❌ Vous avez déjà un ticket ouvert!", ephemeral=True
             )
 
         # Créer le salon du ticket
         category = None
-        if config["tickets"]["category_id"]:
-            category = interaction.guild.get_channel(config["tickets"]["category_id"])
+        if config.tickets.category_id:
+            category = interaction.guild.get_channel(config.tickets.category_id)
 
         overwrites = {
             interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
@@ -524,8 +2948,8 @@ class TicketCategorySelect(discord.ui.Select):
             )
         }
 
-        if config["tickets"]["support_role"]:
-            support_role = interaction.guild.get_role(config["tickets"]["support_role"])
+        if config.tickets.support_role:
+            support_role = interaction.guild.get_role(config.tickets.support_role)
             if support_role:
                 overwrites[support_role] = discord.PermissionOverwrite(
                     read_messages=True, send_messages=True
@@ -607,8 +3031,8 @@ class TicketControlView(discord.ui.View):
         await interaction.response.defer(ephemeral=True)
 
         # 1. Récupérer la config pour trouver le salon de logs
-        config = await bot.db.get_guild_config(interaction.guild.id)
-        log_channel_id = config["tickets"].get("log_channel")
+        config = await bot.db.get_config(interaction.guild.id)
+        log_channel_id = config.tickets.log_channel
         log_channel = interaction.guild.get_channel(log_channel_id) if log_channel_id else None
 
         # 2. Générer le texte du transcript
@@ -695,33 +3119,27 @@ class ShopView(discord.ui.View):
         if not item:
             return await interaction.response.send_message("Article introuvable!", ephemeral=True)
 
-        user = await bot.db.get_user(interaction.user.id, interaction.guild.id)
+        if item[6] == 0:
+            return await interaction.response.send_message("❌ Article en rupture de stock!", ephemeral=True)
 
-        if user["balance"] < item[4]:
+        # Effectuer l'achat: débit conditionnel, puis réservation du stock
+        if await bot.db.try_debit(interaction.user.id, interaction.guild.id, item[4]) is None:
+            user = await bot.db.get_user_fields(interaction.user.id, interaction.guild.id, "balance")
             return await interaction.response.send_message(
                 f"❌ Vous n'avez pas assez de coins! (Vous avez: {user['balance']})",
                 ephemeral=True
             )
 
-        if item[6] == 0:
+        if not await bot.db.take_shop_stock(item_id):
+            await bot.db.add_money(interaction.user.id, interaction.guild.id, item[4])
             return await interaction.response.send_message("❌ Article en rupture de stock!", ephemeral=True)
 
-        # Effectuer l'achat
-        await bot.db.update_user(interaction.user.id, interaction.guild.id, balance=user["balance"] - item[4])
-
         # Donner le rôle si c'est un article de rôle
         if item[5]:
             role = interaction.guild.get_role(item[5])
             if role:
                 await interaction.user.add_roles(role)
 
-        # Mettre à jour le stock
-        if item[6] > 0:
-            await bot.db.conn.execute(
-                "UPDATE shop_items SET stock = stock - 1 WHERE id = ?", (item_id,)
-            )
-            await bot.db.conn.commit()
-
         embed = discord.Embed(
             title="✅ Achat effectué!",
             description=f"Vous avez acheté **{item[2]}** pour **{item[4]}** coins!",
@@ -730,49 +3148,80 @@ class ShopView(discord.ui.View):
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
+def poll_embed(question: str, options: list, counts: list) -> discord.Embed:
+    results = []
+    total_votes = sum(counts)
+
+    for option, count in zip(options, counts):
+        percentage = (count / total_votes * 100) if total_votes > 0 else 0
+        bar = "█" * int(percentage / 10) + "░" * (10 - int(percentage / 10))
+        results.append(f"**{option}**\n{bar} {count} votes ({percentage:.1f}%)")
+
+    embed = discord.Embed(
+        title=f"📊 {question}",
+        description="\n\n".join(results),
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text=f"Total: {total_votes} votes")
+    return embed
+
+
 class PollView(discord.ui.View):
-    def __init__(self, options: list, poll_id: str):
+    """Boutons de vote persistants: le sondage est retrouvé par son message, une seule vue pour tous"""
+
+    def __init__(self, options: list):
         super().__init__(timeout=None)
-        self.votes = {opt: set() for opt in options}
-        self.poll_id = poll_id
 
         for i, option in enumerate(options[:5]):
             button = discord.ui.Button(
                 label=option,
                 style=discord.ButtonStyle.primary,
-                custom_id=f"poll_{poll_id}_{i}"
+                custom_id=f"poll_vote_{i}"
             )
-            button.callback = self.make_callback(option)
+            button.callback = self.make_callback(i)
             self.add_item(button)
 
-    def make_callback(self, option: str):
+    def make_callback(self, index: int):
         async def callback(interaction: discord.Interaction):
-            user_id = interaction.user.id
+            option = await bot.polls.vote(interaction.message, interaction.user.id, index)
+            if option is None:
+                return await interaction.response.send_message("❌ Ce sondage n'existe plus.", ephemeral=True)
+            await interaction.response.send_message(f"✅ Vote enregistré: **{option}**", ephemeral=True)
 
-            # Retirer le vote précédent
-            for opt, voters in self.votes.items():
-                voters.discard(user_id)
+        return callback
 
-            # Ajouter le nouveau vote
-            self.votes[option].add(user_id)
 
-            # Mettre à jour l'embed
-            embed = interaction.message.embeds[0]
-            results = []
-            total_votes = sum(len(v) for v in self.votes.values())
+async def reservoir_sample(iterator, k: int, rng: random.Random = random) -> tuple:
+    """Tirage uniforme de k éléments d'un flux asynchrone (algorithme R); retourne (tirés, vus)"""
+    sample = []
+    seen = 0
+    async for item in iterator:
+        seen += 1
+        if len(sample) < k:
+            sample.append(item)
+        else:
+            j = rng.randrange(seen)
+            if j < k:
+                sample[j] = item
+    return sample, seen
 
-            for opt, voters in self.votes.items():
-                count = len(voters)
-                percentage = (count / total_votes * 100) if total_votes > 0 else 0
-                bar = "█" * int(percentage / 10) + "░" * (10 - int(percentage / 10))
-                results.append(f"**{opt}**\n{bar} {count} votes ({percentage:.1f}%)")
 
-            embed.description = "\n\n".join(results)
-            embed.set_footer(text=f"Total: {total_votes} votes")
+class GiveawayEntryView(discord.ui.View):
+    """Bouton de participation persistant (enregistré au démarrage, valable pour tous les giveaways)"""
 
-            await interaction.response.edit_message(embed=embed)
+    def __init__(self):
+        super().__init__(timeout=None)
 
-        return callback
+    @discord.ui.button(label="Participer", emoji="🎉", style=discord.ButtonStyle.success, custom_id="giveaway_enter")
+    async def enter(self, interaction: discord.Interaction, button: discord.ui.Button):
+        entered = await bot.db.add_giveaway_entry(interaction.message.id, interaction.user.id)
+        if entered is None:
+            msg = "❌ Ce giveaway est terminé."
+        elif entered:
+            msg = "✅ Participation enregistrée, bonne chance!"
+        else:
+            msg = "ℹ️ Vous participez déjà à ce giveaway."
+        await interaction.response.send_message(msg, ephemeral=True)
 
 
 class HelpView(discord.ui.View):
@@ -856,6 +3305,8 @@ class HelpView(discord.ui.View):
 `/poll` - Créer un sondage
 `/giveaway` - Lancer un giveaway
 `/remind` - Créer un rappel
+`/reminders` - Voir vos rappels
+`/cancelreminder` - Annuler un rappel
                 """,
                 color=discord.Color.teal()
             ),
@@ -903,7 +3354,7 @@ class ConfirmView(discord.ui.View):
         
         # On récupère les données
         ticket_data = await bot.db.get_ticket(interaction.channel.id)
-        config = await bot.db.get_guild_config(interaction.guild.id)
+        config = await bot.db.get_config(interaction.guild.id)
         
         # ÉTAPE A : Retirer l'utilisateur (Il ne verra plus le salon)
         if ticket_data:
@@ -914,7 +3365,7 @@ class ConfirmView(discord.ui.View):
                 await interaction.channel.set_permissions(member, overwrite=None)
 
         # ÉTAPE B : Configurer pour le Staff uniquement
-        support_role_id = config["tickets"].get("support_role")
+        support_role_id = config.tickets.support_role
         support_role = interaction.guild.get_role(support_role_id) if support_role_id else None
 
         # On crée les nouvelles permissions
@@ -926,7 +3377,7 @@ class ConfirmView(discord.ui.View):
             new_overwrites[support_role] = discord.PermissionOverwrite(view_channel=True, send_messages=False)
 
         # ÉTAPE C : Déplacer et renommer
-        archive_cat_id = config["tickets"].get("archive_category_id")
+        archive_cat_id = config.tickets.archive_category_id
         archive_cat = interaction.guild.get_channel(archive_cat_id)
 
         await interaction.channel.edit(
@@ -950,22 +3401,48 @@ class ConfirmView(discord.ui.View):
 
 @bot.event
 async def on_member_join(member: discord.Member):
-    config = await bot.db.get_guild_config(member.guild.id)
+    config = await bot.db.get_config(member.guild.id)
+
+    # Anti-raid
+    in_raid = False
+    anti_raid = config.moderation.anti_raid
+    if anti_raid.enabled:
+        account_age = discord.utils.utcnow() - member.created_at
+        in_raid, started = bot.raid_detector.record(
+            member.guild.id, datetime.datetime.now().timestamp(),
+            account_age.days < anti_raid.min_account_age_days,
+            anti_raid.join_threshold, anti_raid.join_window, anti_raid.raid_duration
+        )
+        if started:
+            await bot.log_moderation(
+                member.guild,
+                "🚨 **Raid détecté!** Messages de bienvenue suspendus"
+                + (f", action: `{anti_raid.action}`" if anti_raid.action != "none" else "") + "."
+            )
+        if in_raid and anti_raid.action != "none":
+            bot.raid_actions.queue(member, anti_raid.action, anti_raid.timeout_minutes)
+            if anti_raid.action == "kick":
+                return
 
     # Auto-role
-    if config["welcome"]["auto_role"]:
-        role = member.guild.get_role(config["welcome"]["auto_role"])
+    if config.welcome.auto_role:
+        role = member.guild.get_role(config.welcome.auto_role)
         if role:
             try:
-                await member.add_roles(role)
+                async with bot.join_role_semaphore:
+                    await member.add_roles(role)
             except:
                 pass
 
+    # Pas de bienvenue individuelle pendant un raid
+    if in_raid:
+        return
+
     # Message de bienvenue
-    if config["welcome"]["enabled"] and config["welcome"]["channel_id"]:
-        channel = member.guild.get_channel(config["welcome"]["channel_id"])
+    if config.welcome.enabled and config.welcome.channel_id:
+        channel = member.guild.get_channel(config.welcome.channel_id)
         if channel:
-            message = config["welcome"]["message"].format(
+            message = config.welcome.message.format(
                 user=member.mention,
                 username=member.name,
                 server=member.guild.name,
@@ -983,9 +3460,9 @@ async def on_member_join(member: discord.Member):
             await channel.send(embed=embed)
 
     # DM de bienvenue
-    if config["welcome"]["dm_enabled"]:
+    if config.welcome.dm_enabled:
         try:
-            message = config["welcome"]["dm_message"].format(
+            message = config.welcome.dm_message.format(
                 user=member.name,
                 server=member.guild.name
             )
@@ -996,12 +3473,12 @@ async def on_member_join(member: discord.Member):
 
 @bot.event
 async def on_member_remove(member: discord.Member):
-    config = await bot.db.get_guild_config(member.guild.id)
+    config = await bot.db.get_config(member.guild.id)
 
-    if config["goodbye"]["enabled"] and config["goodbye"]["channel_id"]:
-        channel = member.guild.get_channel(config["goodbye"]["channel_id"])
+    if config.goodbye.enabled and config.goodbye.channel_id:
+        channel = member.guild.get_channel(config.goodbye.channel_id)
         if channel:
-            message = config["goodbye"]["message"].format(
+            message = config.goodbye.message.format(
                 user=member.name,
                 server=member.guild.name,
                 count=member.guild.member_count
@@ -1017,90 +3494,84 @@ async def on_member_remove(member: discord.Member):
             await channel.send(embed=embed)
 
 
+async def check_auto_mod(message: discord.Message, auto_mod: AutoModConfig) -> Optional[str]:
+    """Retourne la raison de la première règle enfreinte, ou None"""
+    # Règles à état: elles doivent voir chaque message pour tenir leurs compteurs
+    now = datetime.datetime.now().timestamp()
+    spam = auto_mod.anti_spam and bot.spam_tracker.hit(
+        message.guild.id, message.author.id, now,
+        auto_mod.spam_max_messages, auto_mod.spam_window
+    )
+    duplicate = auto_mod.anti_duplicates and bot.duplicate_tracker.hit(
+        message.guild.id, message.author.id, message.channel.id, message.content, now,
+        auto_mod.duplicate_threshold, auto_mod.duplicate_window
+    )
+    if spam:
+        return "Spam détecté"
+    if duplicate:
+        return "Message dupliqué en masse"
+
+    if len(message.mentions) > auto_mod.max_mentions:
+        return "Trop de mentions"
+
+    if auto_mod.blocked_extensions and any(
+        a.filename.lower().endswith(auto_mod.blocked_extensions) for a in message.attachments
+    ):
+        return "Pièce jointe interdite"
+
+    # Analyse du contenu seul (mentions déjà vérifiées): réutilisée pour les copies identiques
+    key = bot.verdict_cache.key(auto_mod.version, message.content)
+    entry = bot.verdict_cache.get(key)
+    if entry is None:
+        scan = MessageScan(message.content, auto_mod.banned_matcher, auto_mod.normalize_text)
+        entry = bot.verdict_cache.put(key, scan)
+    reason = evaluate_scan(auto_mod, entry[0], message.author.guild_permissions.manage_messages)
+    if reason or not auto_mod.heavy_rules or not message.content:
+        return reason
+
+    # Règles coûteuses hors de la boucle asyncio; seul un verdict définitif est mis en cache
+    if entry[1] is VerdictCache.MISSING:
+        verdict, definitive = await bot.heavy_rules.check(auto_mod.heavy_rules, message.content)
+        if not definitive:
+            return verdict
+        entry[1] = verdict
+    return entry[1]
+
+
 @bot.event
 async def on_message(message: discord.Message):
     if message.author.bot or not message.guild:
         return
 
-    config = await bot.db.get_guild_config(message.guild.id)
+    config = await bot.db.get_config(message.guild.id)
 
     # Auto-modération
-    if config["moderation"]["auto_mod"]["enabled"]:
-        should_delete = False
-        reason = ""
-
-        # Anti-spam
-        if config["moderation"]["auto_mod"]["anti_spam"]:
-            now = datetime.datetime.now().timestamp()
-            user_messages = bot.spam_tracker[message.author.id]
-            user_messages.append(now)
-            user_messages = [t for t in user_messages if now - t < 5]
-            bot.spam_tracker[message.author.id] = user_messages
-
-            if len(user_messages) >= 5:
-                should_delete = True
-                reason = "Spam détecté"
-
-        # Anti-liens
-        if config["moderation"]["auto_mod"]["anti_links"]:
-            if re.search(r'https?://\S+', message.content):
-                if not message.author.guild_permissions.manage_messages:
-                    should_delete = True
-                    reason = "Liens non autorisés"
-
-        # Anti-majuscules
-        if config["moderation"]["auto_mod"]["anti_caps"]:
-            if len(message.content) > 10:
-                caps_ratio = sum(1 for c in message.content if c.isupper()) / len(message.content) * 100
-                if caps_ratio > config["moderation"]["auto_mod"]["caps_threshold"]:
-                    should_delete = True
-                    reason = "Trop de majuscules"
-
-        # Anti-mentions
-        if len(message.mentions) > config["moderation"]["auto_mod"]["max_mentions"]:
-            should_delete = True
-            reason = "Trop de mentions"
-
-        # Mots interdits
-        for word in config["moderation"]["auto_mod"]["banned_words"]:
-            if word.lower() in message.content.lower():
-                should_delete = True
-                reason = "Mot interdit détecté"
-                break
+    if config.moderation.auto_mod.enabled:
+        reason = await check_auto_mod(message, config.moderation.auto_mod)
 
-        if should_delete:
-            await message.delete()
-            await message.channel.send(
-                f"⚠️ {message.author.mention} - {reason}",
-                delete_after=5
-            )
+        if reason:
+            # Suppression et avertissement groupés par salon (un bulk-delete par fenêtre)
+            bot.deletion_queue.queue(message, reason)
             return
 
     # Système de niveaux
-    if config["leveling"]["enabled"]:
+    if config.leveling.enabled:
         user_id = message.author.id
         now = datetime.datetime.now().timestamp()
-        last_xp = bot.xp_cooldowns[message.guild.id].get(user_id, 0)
-
-        if now - last_xp >= config["leveling"]["xp_cooldown"]:
-            bot.xp_cooldowns[message.guild.id][user_id] = now
-
-            user_data = await bot.db.get_user(user_id, message.guild.id)
-            xp_gain = random.randint(config["leveling"]["xp_min"], config["leveling"]["xp_max"])
-            new_xp = user_data["xp"] + xp_gain
-            new_messages = user_data["messages"] + 1
+        cooldown = config.leveling.xp_cooldown
 
-            # Calcul du niveau (formule: niveau = sqrt(xp/100))
-            new_level = int((new_xp / 100) ** 0.5)
+        if not bot.cooldowns.remaining("xp", message.guild.id, user_id, now, cooldown):
+            bot.cooldowns.start("xp", message.guild.id, user_id, now, cooldown)
 
-            await bot.db.update_user(user_id, message.guild.id, xp=new_xp, messages=new_messages, level=new_level)
+            xp_gain = random.randint(config.leveling.xp_min, config.leveling.xp_max)
+            old_level, new_level = await bot.xp_buffer.add_xp(message.guild.id, user_id, xp_gain)
 
             # Level up!
-            if new_level > user_data["level"]:
+            if new_level > old_level:
                 # Récompenses de rôle
-                role_rewards = config["leveling"]["role_rewards"]
-                if str(new_level) in role_rewards:
-                    role = message.guild.get_role(role_rewards[str(new_level)])
+                role_id = config.leveling.role_rewards.get(new_level)
+                if role_id:
+                    role = message.guild.get_role(role_id)
                     if role:
                         try:
                             await message.author.add_roles(role)
@@ -1108,14 +3579,14 @@ async def on_message(message: discord.Message):
                             pass
 
                 # Message de level up
-                level_up_msg = config["leveling"]["level_up_message"].format(
+                level_up_msg = config.leveling.level_up_message.format(
                     user=message.author.mention,
                     level=new_level
                 )
 
                 channel = message.channel
-                if config["leveling"]["level_up_channel"]:
-                    ch = message.guild.get_channel(config["leveling"]["level_up_channel"])
+                if config.leveling.level_up_channel:
+                    ch = message.guild.get_channel(config.leveling.level_up_channel)
                     if ch:
                         channel = ch
 
@@ -1128,16 +3599,17 @@ async def on_message(message: discord.Message):
                 await channel.send(embed=embed)
 
     # Commandes personnalisées
-    prefix = config["prefix"]
-    if message.content.startswith(prefix):
+    prefix = config.prefix
+    if message.content.startswith(prefix) and message.content[len(prefix):].strip():
         cmd_name = message.content[len(prefix):].split()[0].lower()
-        custom_cmd = await bot.db.get_custom_command(message.guild.id, cmd_name)
-        if custom_cmd:
-            response = custom_cmd[2].format(
-                user=message.author.mention,
-                username=message.author.name,
-                server=message.guild.name
-            )
+        # Index en mémoire: une commande inconnue ne coûte aucune requête
+        parts = await bot.custom_commands.get(message.guild.id, cmd_name)
+        if parts:
+            response = render_response(parts, {
+                "user": message.author.mention,
+                "username": message.author.name,
+                "server": message.guild.name
+            })
             await message.channel.send(response)
 
     await bot.process_commands(message)
@@ -1363,11 +3835,11 @@ async def unlock(interaction: discord.Interaction, channel: discord.TextChannel
 @app_commands.describe(member="Le membre dont voir le solde")
 async def balance(interaction: discord.Interaction, member: discord.Member = None):
     member = member or interaction.user
-    user = await bot.db.get_user(member.id, interaction.guild.id)
-    config = await bot.db.get_guild_config(interaction.guild.id)
+    user = await bot.db.get_user_fields(member.id, interaction.guild.id, "balance", "bank")
+    config = await bot.db.get_config(interaction.guild.id)
 
-    symbol = config["economy"]["currency_symbol"]
-    name = config["economy"]["currency_name"]
+    symbol = config.economy.currency_symbol
+    name = config.economy.currency_name
 
     embed = discord.Embed(
         title=f"💰 Solde de {member.name}",
@@ -1383,14 +3855,26 @@ async def balance(interaction: discord.Interaction, member: discord.Member = Non
 
 @bot.tree.command(name="daily", description="Réclamer votre récompense quotidienne")
 async def daily(interaction: discord.Interaction):
-    user = await bot.db.get_user(interaction.user.id, interaction.guild.id)
-    config = await bot.db.get_guild_config(interaction.guild.id)
+    config = await bot.db.get_config(interaction.guild.id)
 
     now = int(datetime.datetime.now().timestamp())
-    last_daily = user["daily_timestamp"]
-
-    if now - last_daily < 86400:
-        remaining = 86400 - (now - last_daily)
+    amount = config.economy.daily_amount
+
+    # Refus immédiat depuis la mémoire; sinon la base reste l'arbitre du crédit
+    remaining = int(bot.cooldowns.remaining("daily", interaction.guild.id, interaction.user.id, now, 86400))
+    claimed = None
+    if not remaining:
+        # Crédit et horodatage en une requête, seulement si le cooldown est écoulé
+        claimed = await bot.db.claim_reward(
+            interaction.user.id, interaction.guild.id, amount, "daily_timestamp", now, 86400
+        )
+        if claimed is None:
+            user = await bot.db.get_user_fields(interaction.user.id, interaction.guild.id, "daily_timestamp")
+            bot.cooldowns.start("daily", interaction.guild.id, interaction.user.id, user["daily_timestamp"], 86400)
+            remaining = 86400 - (now - user["daily_timestamp"])
+        else:
+            bot.cooldowns.start("daily", interaction.guild.id, interaction.user.id, now, 86400)
+    if claimed is None:
         hours = remaining // 3600
         minutes = (remaining % 3600) // 60
         return await interaction.response.send_message(
@@ -1398,16 +3882,9 @@ async def daily(interaction: discord.Interaction):
             ephemeral=True
         )
 
-    amount = config["economy"]["daily_amount"]
-    await bot.db.update_user(
-        interaction.user.id, interaction.guild.id,
-        balance=user["balance"] + amount,
-        daily_timestamp=now
-    )
-
     embed = discord.Embed(
         title="🎁 Récompense quotidienne!",
-        description=f"Vous avez reçu **{config['economy']['currency_symbol']} {amount}** {config['economy']['currency_name']}!",
+        description=f"Vous avez reçu **{config.economy.currency_symbol} {amount}** {config.economy.currency_name}!",
         color=discord.Color.green()
     )
     await interaction.response.send_message(embed=embed)
@@ -1415,28 +3892,31 @@ async def daily(interaction: discord.Interaction):
 
 @bot.tree.command(name="work", description="Travailler pour gagner de l'argent")
 async def work(interaction: discord.Interaction):
-    user = await bot.db.get_user(interaction.user.id, interaction.guild.id)
-    config = await bot.db.get_guild_config(interaction.guild.id)
+    config = await bot.db.get_config(interaction.guild.id)
 
     now = int(datetime.datetime.now().timestamp())
-    last_work = user["work_timestamp"]
-    cooldown = config["economy"]["work_cooldown"]
-
-    if now - last_work < cooldown:
-        remaining = cooldown - (now - last_work)
+    cooldown = config.economy.work_cooldown
+    amount = random.randint(config.economy.work_min, config.economy.work_max)
+
+    remaining = int(bot.cooldowns.remaining("work", interaction.guild.id, interaction.user.id, now, cooldown))
+    claimed = None
+    if not remaining:
+        claimed = await bot.db.claim_reward(
+            interaction.user.id, interaction.guild.id, amount, "work_timestamp", now, cooldown
+        )
+        if claimed is None:
+            user = await bot.db.get_user_fields(interaction.user.id, interaction.guild.id, "work_timestamp")
+            bot.cooldowns.start("work", interaction.guild.id, interaction.user.id, user["work_timestamp"], cooldown)
+            remaining = cooldown - (now - user["work_timestamp"])
+        else:
+            bot.cooldowns.start("work", interaction.guild.id, interaction.user.id, now, cooldown)
+    if claimed is None:
         minutes = remaining // 60
         return await interaction.response.send_message(
             f"⏰ Vous êtes fatigué! Revenez dans **{minutes}** minutes.",
             ephemeral=True
         )
 
-    amount = random.randint(config["economy"]["work_min"], config["economy"]["work_max"])
-    await bot.db.update_user(
-        interaction.user.id, interaction.guild.id,
-        balance=user["balance"] + amount,
-        work_timestamp=now
-    )
-
     jobs = [
         "développeur", "designer", "streamer", "livreur", "serveur",
         "mécanicien", "jardinier", "photographe", "DJ", "coach"
@@ -1444,7 +3924,7 @@ async def work(interaction: discord.Interaction):
 
     embed = discord.Embed(
         title="💼 Travail terminé!",
-        description=f"Vous avez travaillé comme **{random.choice(jobs)}** et gagné **{config['economy']['currency_symbol']} {amount}** {config['economy']['currency_name']}!",
+        description=f"Vous avez travaillé comme **{random.choice(jobs)}** et gagné **{config.economy.currency_symbol} {amount}** {config.economy.currency_name}!",
         color=discord.Color.green()
     )
     await interaction.response.send_message(embed=embed)
@@ -1459,18 +3939,11 @@ async def pay(interaction: discord.Interaction, member: discord.Member, amount:
     if amount <= 0:
         return await interaction.response.send_message("❌ Montant invalide!", ephemeral=True)
 
-    user = await bot.db.get_user(interaction.user.id, interaction.guild.id)
-
-    if user["balance"] < amount:
+    if not await bot.db.transfer(interaction.guild.id, interaction.user.id, member.id, amount):
         return await interaction.response.send_message("❌ Fonds insuffisants!", ephemeral=True)
 
-    target = await bot.db.get_user(member.id, interaction.guild.id)
-
-    await bot.db.update_user(interaction.user.id, interaction.guild.id, balance=user["balance"] - amount)
-    await bot.db.update_user(member.id, interaction.guild.id, balance=target["balance"] + amount)
-
-    config = await bot.db.get_guild_config(interaction.guild.id)
-    symbol = config["economy"]["currency_symbol"]
+    config = await bot.db.get_config(interaction.guild.id)
+    symbol = config.economy.currency_symbol
 
     embed = discord.Embed(
         title="💸 Transfert effectué!",
@@ -1483,27 +3956,22 @@ async def pay(interaction: discord.Interaction, member: discord.Member, amount:
 @app_commands.describe(member="Le membre", amount="Montant")
 @app_commands.default_permissions(administrator=True)
 async def addcash(interaction: discord.Interaction, member: discord.Member, amount: int):
-    user_data = await bot.db.get_user(member.id, interaction.guild.id)
-    new_balance = user_data["balance"] + amount
-    await bot.db.update_user(member.id, interaction.guild.id, balance=new_balance)
+    await bot.db.add_money(member.id, interaction.guild.id, amount)
     await interaction.response.send_message(f"✅ Ajout de **{amount}** coins à {member.mention}.")
 
 @bot.tree.command(name="removecash", description="Retirer de l'argent à un membre (Admin)")
 @app_commands.describe(member="Le membre", amount="Montant")
 @app_commands.default_permissions(administrator=True)
 async def removecash(interaction: discord.Interaction, member: discord.Member, amount: int):
-    user_data = await bot.db.get_user(member.id, interaction.guild.id)
-    new_balance = max(0, user_data["balance"] - amount)
-    await bot.db.update_user(member.id, interaction.guild.id, balance=new_balance)
+    await bot.db.remove_money(member.id, interaction.guild.id, amount)
     await interaction.response.send_message(f"✅ Retrait de **{amount}** coins à {member.mention}.")
 
 
 @bot.tree.command(name="deposit", description="Déposer de l'argent en banque")
 @app_commands.describe(amount="Montant à déposer (ou 'all' pour tout)")
 async def deposit(interaction: discord.Interaction, amount: str):
-    user = await bot.db.get_user(interaction.user.id, interaction.guild.id)
-
     if amount.lower() == "all":
+        user = await bot.db.get_user_fields(interaction.user.id, interaction.guild.id, "balance")
         amount = user["balance"]
     else:
         try:
@@ -1511,19 +3979,13 @@ async def deposit(interaction: discord.Interaction, amount: str):
         except:
             return await interaction.response.send_message("❌ Montant invalide!", ephemeral=True)
 
-    if amount <= 0 or amount > user["balance"]:
+    if amount <= 0 or await bot.db.move_money(interaction.user.id, interaction.guild.id, amount, to_bank=True) is None:
         return await interaction.response.send_message("❌ Montant invalide ou fonds insuffisants!", ephemeral=True)
 
-    await bot.db.update_user(
-        interaction.user.id, interaction.guild.id,
-        balance=user["balance"] - amount,
-        bank=user["bank"] + amount
-    )
-
-    config = await bot.db.get_guild_config(interaction.guild.id)
+    config = await bot.db.get_config(interaction.guild.id)
     embed = discord.Embed(
         title="🏦 Dépôt effectué!",
-        description=f"Vous avez déposé **{config['economy']['currency_symbol']} {amount}** en banque.",
+        description=f"Vous avez déposé **{config.economy.currency_symbol} {amount}** en banque.",
         color=discord.Color.green()
     )
     await interaction.response.send_message(embed=embed)
@@ -1532,9 +3994,8 @@ async def deposit(interaction: discord.Interaction, amount: str):
 @bot.tree.command(name="withdraw", description="Retirer de l'argent de la banque")
 @app_commands.describe(amount="Montant à retirer (ou 'all' pour tout)")
 async def withdraw(interaction: discord.Interaction, amount: str):
-    user = await bot.db.get_user(interaction.user.id, interaction.guild.id)
-
     if amount.lower() == "all":
+        user = await bot.db.get_user_fields(interaction.user.id, interaction.guild.id, "bank")
         amount = user["bank"]
     else:
         try:
@@ -1542,19 +4003,13 @@ async def withdraw(interaction: discord.Interaction, amount: str):
         except:
             return await interaction.response.send_message("❌ Montant invalide!", ephemeral=True)
 
-    if amount <= 0 or amount > user["bank"]:
+    if amount <= 0 or await bot.db.move_money(interaction.user.id, interaction.guild.id, amount, to_bank=False) is None:
         return await interaction.response.send_message("❌ Montant invalide ou fonds insuffisants!", ephemeral=True)
 
-    await bot.db.update_user(
-        interaction.user.id, interaction.guild.id,
-        balance=user["balance"] + amount,
-        bank=user["bank"] - amount
-    )
-
-    config = await bot.db.get_guild_config(interaction.guild.id)
+    config = await bot.db.get_config(interaction.guild.id)
     embed = discord.Embed(
         title="🏦 Retrait effectué!",
-        description=f"Vous avez retiré **{config['economy']['currency_symbol']} {amount}** de la banque.",
+        description=f"Vous avez retiré **{config.economy.currency_symbol} {amount}** de la banque.",
         color=discord.Color.green()
     )
     await interaction.response.send_message(embed=embed)
@@ -1563,22 +4018,22 @@ async def withdraw(interaction: discord.Interaction, amount: str):
 @bot.tree.command(name="shop", description="Voir la boutique du serveur")
 async def shop(interaction: discord.Interaction):
     items = await bot.db.get_shop_items(interaction.guild.id)
-    user = await bot.db.get_user(interaction.user.id, interaction.guild.id)
-    config = await bot.db.get_guild_config(interaction.guild.id)
+    user = await bot.db.get_user_fields(interaction.user.id, interaction.guild.id, "balance")
+    config = await bot.db.get_config(interaction.guild.id)
 
     if not items:
         return await interaction.response.send_message("🏪 La boutique est vide!", ephemeral=True)
 
     embed = discord.Embed(
         title="🏪 Boutique du serveur",
-        description=f"Votre solde: **{config['economy']['currency_symbol']} {user['balance']}**\n\nSélectionnez un article ci-dessous pour l'acheter.",
+        description=f"Votre solde: **{config.economy.currency_symbol} {user['balance']}**\n\nSélectionnez un article ci-dessous pour l'acheter.",
         color=discord.Color.blue()
     )
 
     for item in items[:10]:
         stock_text = f"Stock: {item[6]}" if item[6] > 0 else "Illimité" if item[6] == -1 else "Rupture"
         embed.add_field(
-            name=f"{item[2]} - {config['economy']['currency_symbol']} {item[4]}",
+            name=f"{item[2]} - {config.economy.currency_symbol} {item[4]}",
             value=f"{item[3]}\n*{stock_text}*",
             inline=False
         )
@@ -1628,7 +4083,7 @@ async def removeshopitem(interaction: discord.Interaction, item_id: int):
         "DELETE FROM shop_items WHERE id = ? AND guild_id = ?",
         (item_id, interaction.guild.id)
     )
-    await bot.db.conn.commit()
+    await bot.db.commit()
     
     embed = discord.Embed(
         title="🗑️ Article supprimé",
@@ -1646,7 +4101,8 @@ async def removeshopitem(interaction: discord.Interaction, item_id: int):
 @app_commands.describe(member="Le membre dont voir le niveau")
 async def rank(interaction: discord.Interaction, member: discord.Member = None):
     member = member or interaction.user
-    user = await bot.db.get_user(member.id, interaction.guild.id)
+    await bot.xp_buffer.flush()
+    user = await bot.db.get_user_fields(member.id, interaction.guild.id, "xp", "level", "messages")
 
     # Calcul XP requis pour prochain niveau
     current_level = user["level"]
@@ -1661,8 +4117,7 @@ async def rank(interaction: discord.Interaction, member: discord.Member = None):
     progress_bar = "█" * progress + "░" * (20 - progress)
 
     # Classement
-    leaderboard = await bot.db.get_leaderboard(interaction.guild.id, "xp", 1000)
-    rank_pos = next((i for i, (uid, _) in enumerate(leaderboard, 1) if uid == member.id), "?")
+    rank_pos = await bot.db.get_rank(interaction.guild.id, user["xp"], "xp")
 
     embed = discord.Embed(
         title=f"📊 Niveau de {member.name}",
@@ -1683,10 +4138,14 @@ async def rank(interaction: discord.Interaction, member: discord.Member = None):
 
 
 @bot.tree.command(name="leaderboard", description="Voir le classement")
-@app_commands.describe(category="Type de classement")
-async def leaderboard(interaction: discord.Interaction, category: Literal["xp", "economy"] = "xp"):
-    data = await bot.db.get_leaderboard(interaction.guild.id, category, 10)
-    config = await bot.db.get_guild_config(interaction.guild.id)
+@app_commands.describe(category="Type de classement", page="Numéro de page")
+async def leaderboard(interaction: discord.Interaction, category: Literal["xp", "economy"] = "xp", page: int = 1):
+    page = max(1, page)
+    if category == "xp" and not bot.db.leaderboards.covers(interaction.guild.id, "xp", (page - 1) * 10, 10):
+        # Préchauffage ou page au-delà du top-K: la base doit contenir l'XP encore en mémoire
+        await bot.xp_buffer.flush()
+    data = await bot.db.get_leaderboard_page(interaction.guild.id, category, page)
+    config = await bot.db.get_config(interaction.guild.id)
 
     if not data:
         return await interaction.response.send_message("📊 Pas de données disponibles!", ephemeral=True)
@@ -1699,7 +4158,7 @@ async def leaderboard(interaction: discord.Interaction, category: Literal["xp",
     medals = ["🥇", "🥈", "🥉"]
     description = []
 
-    for i, (user_id, value) in enumerate(data, 1):
+    for i, (user_id, value) in enumerate(data, (page - 1) * 10 + 1):
         member = interaction.guild.get_member(user_id)
         name = member.name if member else f"User#{user_id}"
         medal = medals[i-1] if i <= 3 else f"**{i}.**"
@@ -1707,9 +4166,10 @@ async def leaderboard(interaction: discord.Interaction, category: Literal["xp",
         if category == "xp":
             description.append(f"{medal} {name} - **{value:,}** XP")
         else:
-            description.append(f"{medal} {name} - **{config['economy']['currency_symbol']} {value:,}**")
+            description.append(f"{medal} {name} - **{config.economy.currency_symbol} {value:,}**")
 
     embed.description = "\n".join(description)
+    embed.set_footer(text=f"Page {page}")
     await interaction.response.send_message(embed=embed)
 
 
@@ -1718,6 +4178,7 @@ async def leaderboard(interaction: discord.Interaction, category: Literal["xp",
 @app_commands.default_permissions(administrator=True)
 async def setxp(interaction: discord.Interaction, member: discord.Member, xp: int):
     new_level = int((xp / 100) ** 0.5)
+    bot.xp_buffer.discard(interaction.guild.id, member.id)
     await bot.db.update_user(member.id, interaction.guild.id, xp=xp, level=new_level)
 
     embed = discord.Embed(
@@ -1733,6 +4194,7 @@ async def setxp(interaction: discord.Interaction, member: discord.Member, xp: in
 @app_commands.default_permissions(administrator=True)
 async def setlevel(interaction: discord.Interaction, member: discord.Member, level: int):
     xp = (level ** 2) * 100
+    bot.xp_buffer.discard(interaction.guild.id, member.id)
     await bot.db.update_user(member.id, interaction.guild.id, xp=xp, level=level)
 
     embed = discord.Embed(
@@ -1754,7 +4216,7 @@ ticket_group = app_commands.Group(name="ticket", description="Commandes de ticke
 @app_commands.default_permissions(administrator=True)
 async def ticket_setup(interaction: discord.Interaction, channel: discord.TextChannel = None):
     channel = channel or interaction.channel
-    config = await bot.db.get_guild_config(interaction.guild.id)
+    config = await bot.db.get_config(interaction.guild.id)
 
     embed = discord.Embed(
         title="🎫 Support - Ouvrir un Ticket",
@@ -1776,15 +4238,15 @@ Notre staff vous répondra dans les plus brefs délais. Nous sommes en France, d
         """,
         color=discord.Color.blue()
     )
-    print(config["tickets"]["categories"])
-    for cat in config["tickets"]["categories"]:
+    print(config.tickets.categories)
+    for cat in config.tickets.categories:
         embed.add_field(
             name=f"{cat['emoji']} {cat['name']}",
             value=cat["description"],
             inline=False
         )
 
-    view = TicketPanelView(config["tickets"]["categories"])
+    view = TicketPanelView(list(config.tickets.categories))
     await channel.send(embed=embed, view=view)
 
     await interaction.response.send_message(f"✅ Panel de tickets créé dans {channel.mention}!", ephemeral=True)
@@ -1946,8 +4408,6 @@ async def poll(interaction: discord.Interaction, question: str, options: str):
     if len(options_list) < 2:
         return await interaction.response.send_message("❌ Minimum 2 options requises!", ephemeral=True)
 
-    poll_id = str(random.randint(1000, 9999))
-
     embed = discord.Embed(
         title=f"📊 {question}",
         description="Cliquez sur un bouton pour voter!",
@@ -1955,14 +4415,27 @@ async def poll(interaction: discord.Interaction, question: str, options: str):
     )
     embed.set_footer(text=f"Créé par {interaction.user.name}")
 
-    view = PollView(options_list, poll_id)
-    await interaction.response.send_message(embed=embed, view=view)
+    # Boutons ajoutés seulement une fois le sondage enregistré: un clic précoce le trouve toujours
+    await interaction.response.send_message(embed=embed)
+    message = await interaction.original_response()
+
+    await bot.db.create_poll(
+        message.id, interaction.guild.id, interaction.channel.id,
+        question, options_list, interaction.user.id
+    )
+    await interaction.edit_original_response(view=PollView(options_list))
 
 
 @bot.tree.command(name="giveaway", description="Créer un giveaway")
-@app_commands.describe(duration="Durée (ex: 1h, 1d)", winners="Nombre de gagnants", prize="Le prix à gagner")
+@app_commands.describe(
+    duration="Durée (ex: 1h, 1d)",
+    winners="Nombre de gagnants",
+    prize="Le prix à gagner",
+    mode="Participation par réaction 🎉 ou par bouton (recommandé pour les gros giveaways)"
+)
 @app_commands.default_permissions(manage_guild=True)
-async def giveaway(interaction: discord.Interaction, duration: str, prize: str, winners: int = 1):
+async def giveaway(interaction: discord.Interaction, duration: str, prize: str, winners: int = 1,
+                   mode: Literal["reaction", "button"] = "reaction"):
     # Parser la durée
     time_units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
     match = re.match(r"(\d+)([smhd])", duration.lower())
@@ -1981,20 +4454,25 @@ async def giveaway(interaction: discord.Interaction, duration: str, prize: str,
 **Fin:** {discord.utils.format_dt(datetime.datetime.fromtimestamp(end_time), 'R')}
 **Organisé par:** {interaction.user.mention}
 
-Réagissez avec 🎉 pour participer!
+{"Cliquez sur **Participer** pour participer!" if mode == "button" else "Réagissez avec 🎉 pour participer!"}
         """,
         color=discord.Color.gold()
     )
     embed.set_footer(text=f"ID: {interaction.id}")
 
-    await interaction.response.send_message(embed=embed)
-    message = await interaction.original_response()
-    await message.add_reaction("🎉")
+    if mode == "button":
+        await interaction.response.send_message(embed=embed, view=GiveawayEntryView())
+        message = await interaction.original_response()
+    else:
+        await interaction.response.send_message(embed=embed)
+        message = await interaction.original_response()
+        await message.add_reaction("🎉")
 
     await bot.db.create_giveaway(
         message.id, interaction.channel.id, interaction.guild.id,
-        prize, winners, end_time, interaction.user.id
+        prize, winners, end_time, interaction.user.id, mode
     )
+    bot.scheduler.schedule("giveaway", message.id, end_time)
 
 
 @bot.tree.command(name="remind", description="Créer un rappel")
@@ -2007,14 +4485,130 @@ async def remind(interaction: discord.Interaction, time: str, reminder: str):
 
     seconds = int(match.group(1)) * time_units[match.group(2)]
 
-    await interaction.response.send_message(f"✅ Je vous rappellerai dans **{time}**!")
+    if await bot.db.count_user_reminders(interaction.user.id) >= MAX_REMINDERS_PER_USER:
+        return await interaction.response.send_message(
+            f"❌ Vous avez déjà {MAX_REMINDERS_PER_USER} rappels en attente!", ephemeral=True
+        )
 
-    await asyncio.sleep(seconds)
+    # Stocké en base et livré par le planificateur: rien ne reste en attente ici
+    reminder_id = await bot.add_reminder(
+        interaction.user.id, interaction.guild.id if interaction.guild else None,
+        interaction.channel.id, reminder, int(datetime.datetime.now().timestamp()) + seconds
+    )
+    await interaction.response.send_message(f"✅ Je vous rappellerai dans **{time}**! (rappel n°{reminder_id})")
 
-    try:
-        await interaction.user.send(f"⏰ **Rappel:** {reminder}")
-    except:
-        await interaction.channel.send(f"⏰ {interaction.user.mention} **Rappel:** {reminder}")
+
+@bot.tree.command(name="reminders", description="Voir vos rappels en attente")
+async def reminders(interaction: discord.Interaction):
+    rows = await bot.db.get_user_reminders(interaction.user.id)
+    if not rows:
+        return await interaction.response.send_message("📭 Aucun rappel en attente.", ephemeral=True)
+
+    embed = discord.Embed(title="⏰ Vos rappels", color=discord.Color.blue())
+    for reminder_id, due, content in rows:
+        embed.add_field(
+            name=f"n°{reminder_id} - {discord.utils.format_dt(datetime.datetime.fromtimestamp(due), 'R')}",
+            value=content[:1024],
+            inline=False
+        )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@bot.tree.command(name="cancelreminder", description="Annuler un rappel")
+@app_commands.describe(reminder_id="Numéro du rappel (voir /reminders)")
+async def cancelreminder(interaction: discord.Interaction, reminder_id: int):
+    if not await bot.db.cancel_reminder(interaction.user.id, reminder_id):
+        return await interaction.response.send_message("❌ Rappel introuvable.", ephemeral=True)
+    await interaction.response.send_message(f"✅ Rappel n°{reminder_id} annulé.", ephemeral=True)
+
+
+@bot.tree.command(name="perf", description="Statistiques internes du bot (caches)")
+@app_commands.default_permissions(administrator=True)
+async def perf(interaction: discord.Interaction):
+    stats = bot.db.cache_stats()
+    writes = bot.db.write_stats()
+    spam = bot.spam_tracker.stats()
+    cooldowns = bot.cooldowns.stats()
+    duplicates = bot.duplicate_tracker.stats()
+    deletions = bot.deletion_queue.stats()
+    raids = bot.raid_detector.stats()
+    heavy = bot.heavy_rules.stats()
+    verdicts = bot.verdict_cache.stats()
+    timers = bot.scheduler.stats()
+    polls = bot.polls.stats()
+    custom = bot.custom_commands.stats()
+
+    embed = discord.Embed(
+        title="📈 Statistiques internes",
+        color=discord.Color.blue()
+    )
+    embed.add_field(
+        name="⚙️ Cache de configuration",
+        value=f"Entrées: {stats['config_entries']}\nHits: {stats['config_hits']:,}\nMiss: {stats['config_misses']:,}\nTaux: {stats['config_hit_rate']:.1f}%",
+        inline=True
+    )
+    embed.add_field(
+        name="🏆 Classements",
+        value=f"En mémoire: {stats['leaderboards']}\nHits: {stats['leaderboard_hits']:,}\nPréchauffages: {stats['leaderboard_warms']:,}",
+        inline=True
+    )
+    embed.add_field(
+        name="💾 Écritures",
+        value=f"Group-commit: {'✅' if writes['group_commit'] else '❌'}\nÉcritures: {writes['writes']:,}\nCommits: {writes['commits']:,}\nEn attente: {writes['pending']}",
+        inline=True
+    )
+    embed.add_field(
+        name="🛡️ Anti-spam",
+        value=f"Membres suivis: {spam['keys']:,}\nHorodatages: {spam['timestamps']:,}\nMémoire: ~{spam['memory_bytes'] / 1024:.1f} Ko\nÉvictions: {spam['evictions']:,}",
+        inline=True
+    )
+    embed.add_field(
+        name="⏳ Cooldowns",
+        value=f"Actifs: {cooldowns['entries']:,}\nTas: {cooldowns['heap']:,}",
+        inline=True
+    )
+    embed.add_field(
+        name="🧬 Doublons",
+        value=f"Serveurs: {duplicates['guilds']:,}\nSignatures: {duplicates['keys']:,}\nMessages bloqués: {duplicates['flagged']:,}",
+        inline=True
+    )
+    embed.add_field(
+        name="🧹 Suppressions auto-mod",
+        value=f"Messages: {deletions['deleted']:,}\nRequêtes: {deletions['requests']:,}\nEn attente: {deletions['pending']}",
+        inline=True
+    )
+    embed.add_field(
+        name="🚨 Anti-raid",
+        value=f"Serveurs suivis: {raids['guilds']:,}\nRaids en cours: {raids['raids']}",
+        inline=True
+    )
+    embed.add_field(
+        name="🧮 Règles lourdes (pool)",
+        value=f"En cours: {heavy['in_flight']}\nEnvoyés: {heavy['dispatched']:,}\nDélais dépassés: {heavy['timeouts']:,}\nSaturé: {heavy['saturated']:,}\nErreurs: {heavy['errors']:,}\nPools recyclés: {heavy['recycles']:,}",
+        inline=True
+    )
+    embed.add_field(
+        name="🗂️ Cache de verdicts",
+        value=f"Entrées: {verdicts['entries']:,}\nHits: {verdicts['hits']:,}\nMiss: {verdicts['misses']:,}\nTaux: {verdicts['hit_rate']:.1f}%",
+        inline=True
+    )
+    embed.add_field(
+        name="⏰ Minuteries",
+        value=f"En attente: {timers['pending']:,}\nEn cours: {timers['running']}\nDéclenchées: {timers['fired']:,}",
+        inline=True
+    )
+    embed.add_field(
+        name="📊 Sondages",
+        value=f"En mémoire: {polls['cached']}\nVotes: {polls['votes']:,}\nRendus: {polls['renders']:,}\nEn attente: {polls['pending']}",
+        inline=True
+    )
+    embed.add_field(
+        name="📝 Commandes personnalisées",
+        value=f"Serveurs indexés: {custom['guilds']}\nHits: {custom['hits']:,}\nInconnues: {custom['misses']:,}\nChargements: {custom['loads']:,}\nUtilisations en attente: {custom['pending_uses']:,}",
+        inline=True
+    )
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -2300,31 +4894,80 @@ async def config_logs(interaction: discord.Interaction, channel: discord.TextCha
 @app_commands.describe(
     enabled="Activer/désactiver",
     anti_spam="Bloquer le spam",
+    spam_max_messages="Anti-spam: nombre de messages déclenchant la règle",
+    spam_window=f"Anti-spam: fenêtre en secondes (max {SPAM_MAX_WINDOW})",
+    anti_duplicates="Bloquer un même message posté par plusieurs membres ou dans plusieurs salons",
+    duplicate_threshold="Doublons: nombre de membres/salons distincts déclenchant la règle",
+    duplicate_window=f"Doublons: fenêtre en secondes (max {DUPLICATE_MAX_WINDOW})",
     anti_links="Bloquer les liens",
     anti_caps="Bloquer les majuscules excessives",
-    max_mentions="Nombre max de mentions"
+    max_mentions="Nombre max de mentions",
+    max_repeated_chars="Caractères identiques consécutifs max (0 = désactivé)",
+    banned_words_mode="Mots interdits: sous-chaîne ou mot entier ('*' = joker en début/fin)",
+    normalize_text="Mots interdits: déjouer leetspeak, homoglyphes et caractères invisibles",
+    fuzzy_banned_words="Mots interdits: tolérer une faute de frappe (mots de 5 lettres ou plus)"
 )
 @app_commands.default_permissions(administrator=True)
 async def config_automod(
     interaction: discord.Interaction,
     enabled: bool = None,
     anti_spam: bool = None,
+    spam_max_messages: int = None,
+    spam_window: int = None,
+    anti_duplicates: bool = None,
+    duplicate_threshold: int = None,
+    duplicate_window: int = None,
     anti_links: bool = None,
     anti_caps: bool = None,
-    max_mentions: int = None
+    max_mentions: int = None,
+    max_repeated_chars: int = None,
+    banned_words_mode: Literal["substring", "word"] = None,
+    normalize_text: bool = None,
+    fuzzy_banned_words: bool = None
 ):
+    if spam_max_messages is not None and spam_max_messages < 2:
+        return await interaction.response.send_message("❌ Il faut au moins 2 messages!", ephemeral=True)
+    if spam_window is not None and not 1 <= spam_window <= SPAM_MAX_WINDOW:
+        return await interaction.response.send_message(
+            f"❌ La fenêtre doit être entre 1 et {SPAM_MAX_WINDOW} secondes!", ephemeral=True
+        )
+    if duplicate_threshold is not None and duplicate_threshold < 2:
+        return await interaction.response.send_message("❌ Il faut au moins 2 membres/salons!", ephemeral=True)
+    if duplicate_window is not None and not 1 <= duplicate_window <= DUPLICATE_MAX_WINDOW:
+        return await interaction.response.send_message(
+            f"❌ La fenêtre doit être entre 1 et {DUPLICATE_MAX_WINDOW} secondes!", ephemeral=True
+        )
+
     config = await bot.db.get_guild_config(interaction.guild.id)
 
     if enabled is not None:
         config["moderation"]["auto_mod"]["enabled"] = enabled
     if anti_spam is not None:
         config["moderation"]["auto_mod"]["anti_spam"] = anti_spam
+    if spam_max_messages is not None:
+        config["moderation"]["auto_mod"]["spam_max_messages"] = spam_max_messages
+    if spam_window is not None:
+        config["moderation"]["auto_mod"]["spam_window"] = spam_window
+    if anti_duplicates is not None:
+        config["moderation"]["auto_mod"]["anti_duplicates"] = anti_duplicates
+    if duplicate_threshold is not None:
+        config["moderation"]["auto_mod"]["duplicate_threshold"] = duplicate_threshold
+    if duplicate_window is not None:
+        config["moderation"]["auto_mod"]["duplicate_window"] = duplicate_window
     if anti_links is not None:
         config["moderation"]["auto_mod"]["anti_links"] = anti_links
     if anti_caps is not None:
         config["moderation"]["auto_mod"]["anti_caps"] = anti_caps
     if max_mentions is not None:
         config["moderation"]["auto_mod"]["max_mentions"] = max_mentions
+    if max_repeated_chars is not None:
+        config["moderation"]["auto_mod"]["max_repeated_chars"] = max_repeated_chars
+    if banned_words_mode is not None:
+        config["moderation"]["auto_mod"]["banned_words_mode"] = banned_words_mode
+    if normalize_text is not None:
+        config["moderation"]["auto_mod"]["normalize_text"] = normalize_text
+    if fuzzy_banned_words is not None:
+        config["moderation"]["auto_mod"]["fuzzy_banned_words"] = fuzzy_banned_words
 
     await bot.db.set_guild_config(interaction.guild.id, config)
 
@@ -2332,10 +4975,77 @@ async def config_automod(
         title="✅ Auto-modération configurée",
         description=f"""
 **Activé:** {config['moderation']['auto_mod']['enabled']}
-**Anti-spam:** {config['moderation']['auto_mod']['anti_spam']}
+**Anti-spam:** {config['moderation']['auto_mod']['anti_spam']} ({config['moderation']['auto_mod']['spam_max_messages']} messages / {config['moderation']['auto_mod']['spam_window']}s)
+**Anti-doublons:** {config['moderation']['auto_mod']['anti_duplicates']} ({config['moderation']['auto_mod']['duplicate_threshold']} membres/salons / {config['moderation']['auto_mod']['duplicate_window']}s)
 **Anti-liens:** {config['moderation']['auto_mod']['anti_links']}
 **Anti-majuscules:** {config['moderation']['auto_mod']['anti_caps']}
 **Max mentions:** {config['moderation']['auto_mod']['max_mentions']}
+**Caractères répétés max:** {config['moderation']['auto_mod']['max_repeated_chars']}
+**Mots interdits:** {config['moderation']['auto_mod']['banned_words_mode']} (normalisation: {config['moderation']['auto_mod']['normalize_text']}, approché: {config['moderation']['auto_mod']['fuzzy_banned_words']})
+        """,
+        color=discord.Color.green()
+    )
+    await interaction.response.send_message(embed=embed)
+
+
+@config_group.command(name="antiraid", description="Configurer la détection de raids")
+@app_commands.describe(
+    enabled="Activer/désactiver",
+    join_threshold="Score d'arrivées déclenchant le mode raid (compte récent = 2)",
+    join_window=f"Fenêtre en secondes (max {RAID_MAX_WINDOW})",
+    min_account_age_days="Âge (jours) en dessous duquel un compte est considéré récent",
+    raid_duration="Secondes sans arrivée avant la fin du mode raid",
+    action="Sanction des arrivées pendant un raid",
+    timeout_minutes="Durée du timeout (minutes)"
+)
+@app_commands.default_permissions(administrator=True)
+async def config_antiraid(
+    interaction: discord.Interaction,
+    enabled: bool = None,
+    join_threshold: int = None,
+    join_window: int = None,
+    min_account_age_days: int = None,
+    raid_duration: int = None,
+    action: Literal["none", "timeout", "kick"] = None,
+    timeout_minutes: int = None
+):
+    if join_threshold is not None and join_threshold < 2:
+        return await interaction.response.send_message("❌ Le seuil doit être d'au moins 2!", ephemeral=True)
+    if join_window is not None and not 1 <= join_window <= RAID_MAX_WINDOW:
+        return await interaction.response.send_message(
+            f"❌ La fenêtre doit être entre 1 et {RAID_MAX_WINDOW} secondes!", ephemeral=True
+        )
+    if timeout_minutes is not None and not 1 <= timeout_minutes <= 40320:
+        return await interaction.response.send_message("❌ Durée maximum: 28 jours!", ephemeral=True)
+
+    config = await bot.db.get_guild_config(interaction.guild.id)
+    anti_raid = config["moderation"]["anti_raid"]
+
+    if enabled is not None:
+        anti_raid["enabled"] = enabled
+    if join_threshold is not None:
+        anti_raid["join_threshold"] = join_threshold
+    if join_window is not None:
+        anti_raid["join_window"] = join_window
+    if min_account_age_days is not None:
+        anti_raid["min_account_age_days"] = max(0, min_account_age_days)
+    if raid_duration is not None:
+        anti_raid["raid_duration"] = max(1, raid_duration)
+    if action is not None:
+        anti_raid["action"] = action
+    if timeout_minutes is not None:
+        anti_raid["timeout_minutes"] = timeout_minutes
+
+    await bot.db.set_guild_config(interaction.guild.id, config)
+
+    embed = discord.Embed(
+        title="✅ Anti-raid configuré",
+        description=f"""
+**Activé:** {anti_raid['enabled']}
+**Seuil:** {anti_raid['join_threshold']} en {anti_raid['join_window']}s
+**Compte récent:** moins de {anti_raid['min_account_age_days']} jours
+**Durée du mode raid:** {anti_raid['raid_duration']}s
+**Action:** {anti_raid['action']} (timeout: {anti_raid['timeout_minutes']} min)
         """,
         color=discord.Color.green()
     )
@@ -2365,6 +5075,46 @@ async def config_bannedword(interaction: discord.Interaction, action: Literal["a
     await interaction.response.send_message(msg, ephemeral=True)
 
 
+@config_group.command(name="automodrule", description="Ajouter/retirer une règle regex ou une extension interdite")
+@app_commands.describe(
+    action="Ajouter ou retirer",
+    kind="Regex sur le contenu ou extension de pièce jointe",
+    value="Le motif regex ou l'extension (ex: .exe)"
+)
+@app_commands.default_permissions(administrator=True)
+async def config_automodrule(
+    interaction: discord.Interaction,
+    action: Literal["add", "remove"],
+    kind: Literal["regex", "extension"],
+    value: str
+):
+    config = await bot.db.get_guild_config(interaction.guild.id)
+    if kind == "regex":
+        rules = config["moderation"]["auto_mod"]["regex_rules"]
+        if action == "add":
+            try:
+                re.compile(value)
+            except re.error as e:
+                return await interaction.response.send_message(f"❌ Regex invalide: {e}", ephemeral=True)
+    else:
+        rules = config["moderation"]["auto_mod"]["blocked_extensions"]
+        value = "." + value.lower().lstrip(".")
+
+    if action == "add":
+        if value in rules:
+            return await interaction.response.send_message("❌ Cette règle existe déjà.", ephemeral=True)
+        rules.append(value)
+        msg = f"✅ Règle `{value}` ajoutée."
+    else:
+        if value not in rules:
+            return await interaction.response.send_message("❌ Cette règle n'existe pas.", ephemeral=True)
+        rules.remove(value)
+        msg = f"✅ Règle `{value}` retirée."
+
+    await bot.db.set_guild_config(interaction.guild.id, config)
+    await interaction.response.send_message(msg, ephemeral=True)
+
+
 @config_group.command(name="tickets", description="Configurer le système de tickets")
 @app_commands.describe(
     category="Catégorie pour les tickets",
@@ -2512,11 +5262,12 @@ customcmd_group = app_commands.Group(name="customcmd", description="Gestion des
 @app_commands.default_permissions(manage_guild=True)
 async def customcmd_add(interaction: discord.Interaction, name: str, response: str):
     await bot.db.add_custom_command(interaction.guild.id, name, response, interaction.user.id)
+    bot.custom_commands.set(interaction.guild.id, name, response)
 
-    config = await bot.db.get_guild_config(interaction.guild.id)
+    config = await bot.db.get_config(interaction.guild.id)
     embed = discord.Embed(
         title="✅ Commande créée",
-        description=f"Utilisez `{config['prefix']}{name}` pour déclencher cette commande.",
+        description=f"Utilisez `{config.prefix}{name}` pour déclencher cette commande.",
         color=discord.Color.green()
     )
     await interaction.response.send_message(embed=embed)
@@ -2527,6 +5278,7 @@ async def customcmd_add(interaction: discord.Interaction, name: str, response: s
 @app_commands.default_permissions(manage_guild=True)
 async def customcmd_delete(interaction: discord.Interaction, name: str):
     await bot.db.delete_custom_command(interaction.guild.id, name)
+    bot.custom_commands.remove(interaction.guild.id, name)
     await interaction.response.send_message(f"✅ Commande `{name}` supprimée!")
 
 
@@ -2537,7 +5289,7 @@ async def customcmd_list(interaction: discord.Interaction):
     if not commands:
         return await interaction.response.send_message("❌ Aucune commande personnalisée!", ephemeral=True)
 
-    config = await bot.db.get_guild_config(interaction.guild.id)
+    config = await bot.db.get_config(interaction.guild.id)
 
     embed = discord.Embed(
         title="📝 Commandes personnalisées",
@@ -2546,7 +5298,7 @@ async def customcmd_list(interaction: discord.Interaction):
 
     for cmd in commands[:25]:
         embed.add_field(
-            name=f"{config['prefix']}{cmd[1]}",
+            name=f"{config.prefix}{cmd[1]}",
             value=f"{cmd[2][:50]}..." if len(cmd[2]) > 50 else cmd[2],
             inline=False
         )
@@ -2562,6 +5314,10 @@ bot.tree.add_command(customcmd_group)
 # ═══════════════════════════════════════════════════════════════════════════════
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--bench-automod":
+        run_automod_benchmark()
+        sys.exit(0)
+
     # Chargez votre token depuis les variables d'environnement ou un fichier .env
     TOKEN = os.getenv("DISCORD_TOKEN")
 